@@ -1476,6 +1476,9 @@ def onReceive(packet, interface):
     # set the message_from_id
     message_from_id = packet['from']
 
+    # The node was just heard, whatever the packet type; any cached offline answer is stale
+    record_node_heard(message_from_id, rxNode, packet.get('rxTime'))
+
     # if message_from_id is not in the seenNodes list add it
     if not any(node['nodeID'] == message_from_id for node in seenNodes):
         seenNodes.append({'nodeID': message_from_id, 'rxInterface': rxNode, 'channel': channel_number, 'welcome': False, 'lastSeen': time.time()})
@@ -1902,7 +1905,7 @@ async def start_rx():
         if online_nodes:
             logger.info(f"System: Checking for undelivered messages to {len(online_nodes)} online nodes at startup")
             for node in online_nodes:
-                resend_undelivered_messages(node['node_id'])
+                queue_resend(node['node_id'])
         else:
             logger.debug("System: No online nodes found at startup for message resend")
     except Exception as e:
@@ -2165,8 +2168,13 @@ async def message_resend_task():
     while True:
         try:
             await asyncio.sleep(30)  # 30 seconds
+            # Only nodes with a message whose retry is due need a resend pass
+            due_node_ids = db_handler.get_nodes_with_due_messages()
+            if not due_node_ids:
+                logging.debug("System: No messages due for periodic resend")
+                continue
             all_nodes = db_handler.get_nodes()
-            online_nodes = [n for n in all_nodes if n.get('is_online', 0) == 1]
+            online_nodes = [n for n in all_nodes if n.get('is_online', 0) == 1 and str(n['node_id']) in due_node_ids]
 
             # Filter out bot's own nodes to prevent self-resending
             bot_node_ids = [globals().get(f'myNodeNum{i}') for i in range(1, 10) if globals().get(f'myNodeNum{i}') is not None]
@@ -2175,7 +2183,7 @@ async def message_resend_task():
             if online_nodes:
                 logging.debug(f"System: Checking for undelivered messages to {len(online_nodes)} online nodes")
                 for node in online_nodes:
-                    resend_undelivered_messages(node['node_id'])
+                    queue_resend(node['node_id'])
             else:
                 logging.debug("System: No online nodes found for periodic message resend")
         except Exception as e:
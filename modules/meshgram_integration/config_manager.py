@@ -2,7 +2,7 @@ import logging
 import re
 import shutil
 from datetime import datetime
-from typing import Any, Optional, List
+from typing import Any, Optional, List, Tuple
 from pathlib import Path
 from modules import settings
 from modules import log
@@ -14,6 +14,8 @@ class ConfigManager:
         self.config_path = getattr(settings, 'config_file_path', 'config.ini')
         self.backup_dir = Path('config_backups')
         self.backup_dir.mkdir(exist_ok=True)
+        self._authorized_users_raw: Optional[str] = None
+        self._authorized_users: Tuple[int, ...] = ()
 
     def get(self, key: str, default: Optional[Any] = None) -> Any:
         key_parts = key.split('.', 1)
@@ -33,11 +35,13 @@ class ConfigManager:
                 return default
             raise KeyError(f"Configuration key '{key}' not found and no default value provided")
 
-    def get_authorized_users(self) -> List[int]:
+    def get_authorized_users(self) -> Tuple[int, ...]:
         users_str = self.get('telegram.telegram_authorized_users', '')
-        if users_str:
-            return [int(user.strip()) for user in users_str.split(',') if user.strip().isdigit()]
-        return []
+        # Only re-parse when the configured value changes
+        if users_str != self._authorized_users_raw:
+            self._authorized_users = tuple(int(user.strip()) for user in users_str.split(',') if user.strip().isdigit())
+            self._authorized_users_raw = users_str
+        return self._authorized_users
 
     def validate_config(self) -> None:
         required_keys = [
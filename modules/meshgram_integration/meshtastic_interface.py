@@ -42,6 +42,7 @@ class MeshtasticInterface:
         self.last_telemetry: Dict[str, Any] = {}
         self.max_retries: int = 3
         self.retry_interval: int = 60
+        self.max_air_util_tx: float = 10.0  # percent of airtime the local node may use for TX
         self.node_manager: NodeManager = NodeManager()
         self.is_setup: bool = False
         self.is_closing: bool = False
@@ -114,6 +115,15 @@ class MeshtasticInterface:
             self.pending_messages.append(PendingMessage(text, recipient))
             raise
 
+    def airtime_exceeded(self) -> bool:
+        """Return True when the local node's TX airtime is above the budget and sends should be spaced out."""
+        try:
+            air_util_tx = self.interface.getMyNodeInfo().get('deviceMetrics', {}).get('airUtilTx')
+        except Exception as e:
+            self.logger.debug(f"Could not read airUtilTx: {e}")
+            return False
+        return isinstance(air_util_tx, (int, float)) and air_util_tx >= self.max_air_util_tx
+
     async def send_bell(self, dest_id: str) -> None:
         if not dest_id:
             raise ValueError("Destination ID must not be empty")
@@ -59,6 +59,7 @@ class MessageProcessor:
         self.reverse_message_id_map: dict[str, int] = {}
         self.pending_acks: dict[int, PendingAck] = {}
         self.ack_timeout: int = 90  # seconds
+        self.chunk_spacing: int = 5  # seconds between chunks when the airtime budget is exceeded
         self.bell_rate_limit: dict[int, datetime] = {}  # Track bell command usage per user
         self.bell_cooldown_seconds: int = 120  # 2 minutes cooldown for non-authorized users
 
@@ -202,45 +203,53 @@ class MessageProcessor:
 
         self.logger.info(f"Message chunked into {len(chunks)} parts: {[chunk[:50] + '...' if len(chunk) > 50 else chunk for chunk in chunks]}")
 
-        # Send each chunk separately and track ACKs
-        chunk_message_ids = []
+        # Send chunks one at a time so they reach the radio in order and the
+        # interface only ever sees one sendText call; only space them out while
+        # the radio is over its airtime budget
+        spaced = len(chunks) > 1 and self.meshtastic.airtime_exceeded()
+        if spaced:
+            self.logger.info(f"Airtime budget exceeded, spacing {len(chunks)} chunks {self.chunk_spacing}s apart")
+        sent_count = 0
         for i, chunk in enumerate(chunks):
-            try:
-                meshtastic_packet = await self.meshtastic.send_message(chunk, recipient)
-                meshtastic_message_id = meshtastic_packet.get('id') if isinstance(meshtastic_packet, dict) else meshtastic_packet.id
-                chunk_message_ids.append(meshtastic_message_id)
-                self.logger.info(f"Successfully sent chunk {i+1}/{len(chunks)} to Meshtastic: {chunk[:50]}... -> {recipient}")
-
-                # Track ACK for each chunk
-                self.pending_acks[meshtastic_message_id] = {
-                    'telegram_message_id': telegram_message_id,
-                    'timestamp': datetime.now(timezone.utc),
-                    'text': chunk,
-                    'recipient': recipient,
-                    'chunk_index': i,
-                    'total_chunks': len(chunks)
-                }
-
-                # Schedule ACK timeout removal for each chunk
-                asyncio.create_task(self.remove_pending_ack(meshtastic_message_id))
-
-                # Add 5-second delay between sending chunks
-                await asyncio.sleep(5)
-
-            except Exception as e:
-                self.logger.error(f"Failed to send chunk {i+1}/{len(chunks)} to Meshtastic: {e}", exc_info=True)
-                # Continue with other chunks even if one fails
+            if i and spaced:
+                await asyncio.sleep(self.chunk_spacing)
+            meshtastic_message_id = await self._send_chunk(chunk, recipient, i, len(chunks))
+            if meshtastic_message_id is None:
                 continue
 
+            # Track the ACK as soon as the chunk is out, its ACK can arrive
+            # while later chunks are still being sent
+            self.pending_acks[meshtastic_message_id] = {
+                'telegram_message_id': telegram_message_id,
+                'timestamp': datetime.now(timezone.utc),
+                'text': chunk,
+                'recipient': recipient,
+                'chunk_index': i,
+                'total_chunks': len(chunks)
+            }
+            asyncio.create_task(self.remove_pending_ack(meshtastic_message_id))
+            sent_count += 1
+
         # If no chunks were sent successfully, notify the user
-        if not chunk_message_ids:
+        if not sent_count:
             await self.telegram.send_message("Failed to send message to Meshtastic. Please try again.")
 
+    async def _send_chunk(self, chunk: str, recipient: str, index: int, total: int) -> Any:
+        """Send one chunk to Meshtastic and return its message ID, or None if sending failed."""
+        try:
+            meshtastic_packet = await self.meshtastic.send_message(chunk, recipient)
+            meshtastic_message_id = meshtastic_packet.get('id') if isinstance(meshtastic_packet, dict) else meshtastic_packet.id
+            self.logger.info(f"Successfully sent chunk {index+1}/{total} to Meshtastic: {chunk[:50]}... -> {recipient}")
+            return meshtastic_message_id
+        except Exception as e:
+            self.logger.error(f"Failed to send chunk {index+1}/{total} to Meshtastic: {e}", exc_info=True)
+            # Other chunks are still sent even if one fails
+            return None
+
     async def remove_pending_ack(self, message_id: str) -> None:
         await asyncio.sleep(self.ack_timeout)
-        if message_id in self.pending_acks:
+        if self.pending_acks.pop(message_id, None) is not None:
             self.logger.warning(f"ACK timeout for message ID: {message_id}")
-            del self.pending_acks[message_id]
 
     async def process_pending_acks(self) -> None:
         while True:
@@ -259,8 +268,8 @@ class MessageProcessor:
                             'text': data['text'],
                             'recipient': data['recipient']
                         }
-                        # Remove the old entry
-                        del self.pending_acks[message_id]
+                        # Remove the old entry, it may already be gone if its ACK arrived during the resend
+                        self.pending_acks.pop(message_id, None)
                         self.logger.info(f"Retried message for Telegram ID: {data['telegram_message_id']}, new Meshtastic ID: {new_message_id}")
                     except Exception as e:
                         self.logger.error(f"Failed to retry message for Telegram ID: {data['telegram_message_id']}: {e}")
@@ -269,7 +278,7 @@ class MessageProcessor:
                         if telegram_message_id:
                             await self.telegram.add_reaction(telegram_message_id, '✅')
                             self.logger.info(f"Marked as delivered after retry failure for Telegram ID: {telegram_message_id}")
-                        del self.pending_acks[message_id]
+                        self.pending_acks.pop(message_id, None)
             await asyncio.sleep(10)  # Check every 10 seconds
 
     async def handle_telegram_message(self, message: TelegramMessage) -> None:
@@ -745,37 +754,33 @@ class MessageProcessor:
         if len(message) <= 110:
             return [message]
 
-        # Split into chunks of 110 characters, leaving space for counters
+        # Split into chunks of 110 characters, leaving space for counters.
+        # A cursor walks the message so nothing is re-sliced or re-scanned.
         chunks = []
-        remaining = message
         chunk_size = 110
+        start = 0
+        end = len(message)
 
-        while remaining:
-            if len(remaining) <= chunk_size:
-                chunks.append(remaining)
-                break
-
+        while end - start > chunk_size:
             # Find the last space within the chunk size to avoid breaking words
-            chunk = remaining[:chunk_size]
-            last_space = chunk.rfind(' ')
+            last_space = message.rfind(' ', start, start + chunk_size)
 
-            if last_space > 0:
+            if last_space > start:
                 # Break at the space
-                chunk = remaining[:last_space]
-                remaining = remaining[last_space + 1:]
+                chunks.append(message[start:last_space])
+                start = last_space + 1
             else:
                 # No space found, break at chunk_size
-                chunk = remaining[:chunk_size]
-                remaining = remaining[chunk_size:]
+                chunks.append(message[start:start + chunk_size])
+                start += chunk_size
 
-            chunks.append(chunk)
+        if start < end:
+            chunks.append(message[start:])
 
         # Add counters to chunks (only if multiple chunks)
         if len(chunks) > 1:
             total_chunks = len(chunks)
-            for i, chunk in enumerate(chunks):
-                counter = f"{i+1}/{total_chunks} "
-                chunks[i] = counter + chunk
+            chunks = [f"{i}/{total_chunks} {chunk}" for i, chunk in enumerate(chunks, start=1)]
 
         return chunks
 
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from functools import lru_cache
 from typing import Dict, Any, Optional, List, Union, TypedDict
 from datetime import datetime, timedelta
 from telegram.helpers import escape_markdown
@@ -25,6 +26,16 @@ class NodeData(TypedDict):
     neighbors: Dict[str, Any]
     sensor: Dict[str, Any]
 
+@lru_cache(maxsize=1024)
+def _parse_node_id(node_id: Union[str, int]) -> int:
+    # Pure conversion over a keyspace bounded by the number of mesh nodes, so results are cached
+    if isinstance(node_id, str) and node_id.startswith('!'):
+        return int(node_id[1:], 16)
+    elif isinstance(node_id, str):
+        return int(node_id)
+    else:
+        return node_id
+
 class NodeManager:
     def __init__(self) -> None:
         self.nodes: Dict[str, NodeData] = {}
@@ -33,12 +44,7 @@ class NodeManager:
 
     def get_node_id(self, node_id: Union[str, int]) -> int:
         """Convert node ID string to numeric ID."""
-        if isinstance(node_id, str) and node_id.startswith('!'):
-            return int(node_id[1:], 16)
-        elif isinstance(node_id, str):
-            return int(node_id)
-        else:
-            return node_id
+        return _parse_node_id(node_id)
 
     def format_node_name(self, node_id: Union[str, int], short_name: str) -> str:
         numeric_id: int = self.get_node_id(node_id)
@@ -13,10 +13,13 @@ import random
 import contextlib # for suppressing output on watchdog
 import io # for suppressing output on watchdog
 import uuid
+import sqlite3
+import threading
+import queue
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from webui.db_handler import save_message, update_message_delivery_status, get_undelivered_messages, get_queued_messages, update_node_telemetry, get_node_by_id, mark_messages_delivered_to_node, insert_telemetry, delete_message, get_db_connection, get_message_by_id, update_message_status, retry_message, delete_message_by_user, update_node_on_packet
+from webui.db_handler import save_message, update_message_delivery_status, bulk_update_message_delivery_status, mark_messages_delivered, get_undelivered_messages, get_queued_messages, update_node_telemetry, get_node_by_id, mark_messages_delivered_to_node, insert_telemetry, delete_message, get_db_connection, get_thread_db_cursor, RESEND_MESSAGES_SQL, get_message_by_id, update_message_status, retry_message, delete_message_by_user, update_node_on_packet
 
 # Import trigger system modules
 try:
@@ -47,6 +50,30 @@ interface_retry_count = 3
 # Trigger system global variables
 trigger_engine = None
 
+# Translation table used to flatten multi-line chunks for the log
+_NL_TO_SPACE = str.maketrans({'\n': ' '})
+
+# Per-interface send rate limiters, created on first use
+interface_send_buckets = {}
+
+# Backoff for deferred messages, in seconds
+DEFER_BACKOFF_BASE = 60
+DEFER_BACKOFF_MAX = 3600
+DEFER_BACKOFF_JITTER = 30
+
+# Resend passes run on a single worker thread so packet callbacks never block on DB or radio I/O
+resend_requests = queue.SimpleQueue()
+resend_pending = set()
+resend_pending_lock = threading.Lock()
+resend_worker = None
+
+# Short-lived cache of is_node_online results keyed by (node_id, nodeInt)
+NODE_ONLINE_CACHE_TTL = 1  # seconds
+node_online_cache = {}
+
+# Last time each node was heard by the bot keyed by (node_id, nodeInt), fed from received packets
+node_last_heard = {}
+
 # Ping Configuration
 if ping_enabled:
     # ping, pinging, ack, testing, test, pong
@@ -343,6 +370,13 @@ for i in range(1, 10):
     else:
         globals()[f'myNodeNum{i}'] = 777
 
+def refresh_bot_nodes():
+    """Re-derive the set of the bot's own node numbers, call after any myNodeNum changes."""
+    global BOT_NODES
+    BOT_NODES = frozenset(num for num in (globals().get(f'myNodeNum{i}') for i in range(1, 10)) if num)
+
+refresh_bot_nodes()
+
 #### FUN-ctions ####
 
 def decimal_to_hex(decimal_number):
@@ -474,33 +508,71 @@ def get_node_location(nodeID, nodeInt=1, channel=0):
             return position
 
 
-def is_node_online(node_id, nodeInt=1, use_ping=False):
-    """Check if a node is online based on last heard time (within 2 hours) and optionally ping."""
+def get_node_by_num(node_id, nodeInt=1):
+    """Look up a node in the interface nodeDB by its number."""
     interface = globals()[f'interface{nodeInt}']
+    # meshtastic already keeps a num -> node map alongside interface.nodes
+    nodes_by_num = getattr(interface, 'nodesByNum', None)
+    if isinstance(nodes_by_num, dict):
+        return nodes_by_num.get(node_id)
 
+    # Interfaces without nodesByNum: scan the nodeDB
     if interface.nodes:
         for node in interface.nodes.values():
-            if node['num'] == node_id:
-                last_heard = node.get('lastHeard', 0)
-                # Check if last heard within 2 hours (7200 seconds)
-                if last_heard and (time.time() - last_heard) <= 1800:
-                    return True
-                elif use_ping:
-                    # Attempt ping if available and last heard check failed
-                    try:
-                        logger.debug(f"System: Attempting ping for node {node_id} on interface {nodeInt}")
-                        # Meshtastic interface has ping method
-                        ping_result = interface.ping(node_id, wantAck=True)
-                        if ping_result:
-                            logger.debug(f"System: Ping successful for node {node_id}")
-                            return True
-                        else:
-                            logger.debug(f"System: Ping failed for node {node_id}")
-                    except Exception as e:
-                        logger.debug(f"System: Ping not available or failed for node {node_id}: {e}")
-                break  # Found the node, no need to continue
+            if node.get('num') == node_id:
+                return node
+    return None
 
-    return False
+def invalidate_node_online_cache(node_id):
+    """Drop cached is_node_online results for a node, e.g. when a packet is received from it."""
+    for i in range(1, 10):
+        node_online_cache.pop((node_id, i), None)
+
+def record_node_heard(node_id, nodeInt, heard_time=None):
+    """Remember when a node was last heard on an interface so is_node_online can skip the node lookup."""
+    node_last_heard[(node_id, nodeInt)] = heard_time or time.time()
+    invalidate_node_online_cache(node_id)
+
+def is_node_online(node_id, nodeInt=1, use_ping=False):
+    """Check if a node is online based on last heard time (within 2 hours) and optionally ping."""
+    now = time.time()
+    cache_key = (node_id, nodeInt)
+    # Heard directly by the bot recently, no need to look at the node db
+    last_heard = node_last_heard.get(cache_key)
+    if last_heard and (now - last_heard) <= 1800:
+        return True
+    # Ping results are never cached, a ping must always reach the radio
+    if not use_ping:
+        cached = node_online_cache.get(cache_key)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+    interface = globals()[f'interface{nodeInt}']
+    online = False
+
+    node = get_node_by_num(node_id, nodeInt)
+    if node is not None:
+        last_heard = node.get('lastHeard', 0)
+        # Check if last heard within 2 hours (7200 seconds)
+        if last_heard and (now - last_heard) <= 1800:
+            online = True
+        elif use_ping:
+            # Attempt ping if available and last heard check failed
+            try:
+                logger.debug("System: Attempting ping for node %s on interface %s", node_id, nodeInt)
+                # Meshtastic interface has ping method
+                ping_result = interface.ping(node_id, wantAck=True)
+                if ping_result:
+                    logger.debug("System: Ping successful for node %s", node_id)
+                    online = True
+                else:
+                    logger.debug("System: Ping failed for node %s", node_id)
+            except Exception as e:
+                logger.debug("System: Ping not available or failed for node %s: %s", node_id, e)
+
+    if not use_ping:
+        node_online_cache[cache_key] = (now + NODE_ONLINE_CACHE_TTL, online)
+    return online
 
 def get_closest_nodes(nodeInt=1,returnCount=3):
     interface = globals()[f'interface{nodeInt}']
@@ -574,6 +646,37 @@ def handleSentinelIgnore(nodeInt=1, nodeID=0, aor=False):
         sentryIgnoreList.remove(str(nodeID))
         logger.info(f"System: Removed {nodeID} from sentry ignore list")
 
+class TokenBucket:
+    """Token bucket rate limiter that only blocks once the burst capacity is spent."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate  # tokens refilled per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, cost):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Allow the balance to go negative so a chunk larger than the capacity still goes out
+            self.tokens -= cost
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+def get_send_bucket(nodeInt=1):
+    """Get the rate limiter pacing chunk sends on an interface, None when splitDelay is disabled."""
+    if splitDelay <= 0:
+        return None
+    bucket = interface_send_buckets.get(nodeInt)
+    if bucket is None:
+        # Refill one full chunk every splitDelay seconds, with a burst of one chunk
+        bucket = interface_send_buckets[nodeInt] = TokenBucket(MESSAGE_CHUNK_SIZE / splitDelay, MESSAGE_CHUNK_SIZE)
+    return bucket
+
 def messageChunker(message):
     if len(message) <= MESSAGE_CHUNK_SIZE:
         return [message]
@@ -602,12 +705,12 @@ def send_message(message, ch, nodeid=0, nodeInt=1, bypassChuncking=False, resend
     # Send a message to a channel or DM with retry logic and offline saving
     interface = globals()[f'interface{nodeInt}']
     # Check if the message is empty
-    if message == "" or message == None or len(message) == 0:
+    if not message:
         return False
 
     # Prevent sending to own node
-    if nodeid != 0 and nodeid in [globals().get(f'myNodeNum{i}') for i in range(1, 10) if globals().get(f'myNodeNum{i}')]:
-        logger.warning(f"System: Attempted to send message to own node {nodeid}")
+    if nodeid and nodeid in BOT_NODES:
+        logger.warning("System: Attempted to send message to own node %s", nodeid)
         return False
 
     # Determine start_attempt and message_id
@@ -617,47 +720,43 @@ def send_message(message, ch, nodeid=0, nodeInt=1, bypassChuncking=False, resend
         if msg:
             start_attempt = msg['attempt_count']
         else:
-            logger.error(f"System: Message {message_id} not found for resend")
+            logger.error("System: Message %s not found for resend", message_id)
             return False
     else:
         start_attempt = 0
         message_id = str(uuid.uuid4())
+        from_node_id = str(globals().get(f'myNodeNum{nodeInt}', 777))
+        timestamp = time.time()
 
         # Check online status and save message
         if nodeid != 0:
             if not is_node_online(nodeid, nodeInt):
                 # Offline, queue the message
-                from_node_id = str(globals().get(f'myNodeNum{nodeInt}', 777))
                 to_node_id = str(nodeid)
                 is_dm = True
-                timestamp = time.time()
                 try:
                     save_message(from_node_id, to_node_id, str(ch), message, timestamp, is_dm, status='queued', attempt_count=0, message_id=message_id)
-                    logger.info(f"System: Message queued for offline recipient {nodeid}")
+                    logger.info("System: Message queued for offline recipient %s", nodeid)
                 except Exception as e:
-                    logger.error(f"System: Failed to queue message for offline recipient {nodeid}: {e}")
+                    logger.error("System: Failed to queue message for offline recipient %s: %s", nodeid, e)
                 return False
             else:
                 # Online, save as sent
-                from_node_id = str(globals().get(f'myNodeNum{nodeInt}', 777))
                 to_node_id = str(nodeid)
                 is_dm = True
-                timestamp = time.time()
                 try:
                     save_message(from_node_id, to_node_id, str(ch), message, timestamp, is_dm, status='sent', attempt_count=1, message_id=message_id)
                 except Exception as e:
-                    logger.error(f"System: Failed to save message to database: {e}")
+                    logger.error("System: Failed to save message to database: %s", e)
                     return False
         else:
             # Channel message
-            from_node_id = str(globals().get(f'myNodeNum{nodeInt}', 777))
             to_node_id = None
             is_dm = False
-            timestamp = time.time()
             try:
                 save_message(from_node_id, to_node_id, str(ch), message, timestamp, is_dm, status='sent', attempt_count=1, message_id=message_id)
             except Exception as e:
-                logger.error(f"System: Failed to save message to database: {e}")
+                logger.error("System: Failed to save message to database: %s", e)
                 return False
 
     # Attempt delivery with refined retry logic: 3 attempts then defer, total 9 then undelivered
@@ -665,10 +764,10 @@ def send_message(message, ch, nodeid=0, nodeInt=1, bypassChuncking=False, resend
     max_total_attempts = 9
 
     for attempt in range(start_attempt, max_total_attempts):
+        # The attempt is recorded together with its outcome, so each attempt costs a single UPDATE
+        current_attempt_count = attempt + 1
+        attempt_time = time.time()
         try:
-            current_attempt_count = attempt + 1
-            update_message_delivery_status(message_id, attempt_count=current_attempt_count, last_attempt_time=time.time())
-
             if not bypassChuncking:
                 # Split the message into chunks if it exceeds the MESSAGE_CHUNK_SIZE
                 message_list = messageChunker(message)
@@ -676,144 +775,187 @@ def send_message(message, ch, nodeid=0, nodeInt=1, bypassChuncking=False, resend
                 message_list = [message]
 
             # Send the message to the channel or DM
-            total_length = sum(len(chunk) for chunk in message_list)
             num_chunks = len(message_list)
-            for m in message_list:
-                chunkOf = f"{message_list.index(m)+1}/{num_chunks}"
+            send_bucket = get_send_bucket(nodeInt)
+            log_chunks = logger.isEnabledFor(logging.INFO)
+            for chunk_num, m in enumerate(message_list, start=1):
+                # wait only as long as needed to keep the configured rate between split messages
+                if send_bucket is not None:
+                    send_bucket.acquire(len(m))
                 if nodeid == 0:
                     # Send to channel - always use ACK for delivery confirmation
-                    logger.info(f"Device:{nodeInt} Channel:{ch} Attempt:{current_attempt_count} " + CustomFormatter.red + f"req.ACK " + f"Chunker{chunkOf} SendingChannel: " + CustomFormatter.white + m.replace('\n', ' '))
+                    if log_chunks:
+                        logger.info(f"Device:{nodeInt} Channel:{ch} Attempt:{current_attempt_count} " + CustomFormatter.red + "req.ACK " + f"Chunker{chunk_num}/{num_chunks} SendingChannel: " + CustomFormatter.white + m.translate(_NL_TO_SPACE))
                     interface.sendText(text=m, channelIndex=ch, wantAck=True)
                 else:
                     # Send to DM - always use ACK for delivery confirmation
-                    logger.info(f"Device:{nodeInt} Attempt:{current_attempt_count} " + CustomFormatter.red + f"req.ACK " + f"Chunker{chunkOf} Sending DM: " + CustomFormatter.white + m.replace('\n', ' ') + CustomFormatter.purple +\
-                                  " To: " + CustomFormatter.white + f"{get_name_from_number(nodeid, 'long', nodeInt)}")
+                    if log_chunks:
+                        logger.info(f"Device:{nodeInt} Attempt:{current_attempt_count} " + CustomFormatter.red + "req.ACK " + f"Chunker{chunk_num}/{num_chunks} Sending DM: " + CustomFormatter.white + m.translate(_NL_TO_SPACE) + CustomFormatter.purple +\
+                                      " To: " + CustomFormatter.white + f"{get_name_from_number(nodeid, 'long', nodeInt)}")
                     interface.sendText(text=m, channelIndex=ch, destinationId=nodeid, wantAck=True)
 
                 # Throttle the message sending to prevent spamming the device
-                if (message_list.index(m)+1) % 4 == 0:
+                if chunk_num % 4 == 0:
                     time.sleep(responseDelay + 1)
-                    if (message_list.index(m)+1) % 5 == 0:
-                        logger.warning(f"System: throttling rate Interface{nodeInt} on {chunkOf}")
-
-                # wait an amount of time between sending each split message
-                time.sleep(splitDelay)
+                    if chunk_num % 5 == 0:
+                        logger.warning("System: throttling rate Interface%s on %s/%s", nodeInt, chunk_num, num_chunks)
 
             # If we reach here without exception, assume success
-            update_message_delivery_status(message_id, delivered=True, status='delivered')
-            logger.info(f"System: Message {message_id} delivered successfully on attempt {current_attempt_count}")
+            update_message_delivery_status(message_id, delivered=True, status='delivered',
+                                        attempt_count=current_attempt_count, last_attempt_time=attempt_time)
+            logger.info("System: Message %s delivered successfully on attempt %s", message_id, current_attempt_count)
             return True
 
         except Exception as e:
             error_msg = str(e)
             # Check for specific connection errors
             if "Broken pipe" in error_msg or "Errno 32" in error_msg:
-                logger.error(f"System: BrokenPipeError detected on interface{nodeInt} during message {message_id} delivery attempt {current_attempt_count}: {error_msg}")
+                logger.error("System: BrokenPipeError detected on interface%s during message %s delivery attempt %s: %s", nodeInt, message_id, current_attempt_count, error_msg)
                 # Trigger reconnection for this interface
                 globals()[f'retry_int{nodeInt}'] = True
-                logger.warning(f"System: Set retry flag for interface{nodeInt} due to BrokenPipeError")
+                logger.warning("System: Set retry flag for interface%s due to BrokenPipeError", nodeInt)
             elif "timeout" in error_msg.lower() or "timed out" in error_msg.lower():
-                logger.warning(f"System: Timeout detected on interface{nodeInt} during message {message_id} delivery attempt {current_attempt_count}: {error_msg}")
+                logger.warning("System: Timeout detected on interface%s during message %s delivery attempt %s: %s", nodeInt, message_id, current_attempt_count, error_msg)
             else:
-                logger.warning(f"System: Delivery attempt {current_attempt_count} failed for message {message_id}: {error_msg}")
+                logger.warning("System: Delivery attempt %s failed for message %s: %s", current_attempt_count, message_id, error_msg)
 
             # After 3 direct attempts, defer the message
             if current_attempt_count >= start_attempt + max_direct_attempts and current_attempt_count < max_total_attempts:
                 # Defer: set status to 'queued', increment defer_count, set next_retry_time
                 defer_count = (current_attempt_count // max_direct_attempts)
-                next_retry_time = time.time() + (60 * defer_count)  # Exponential defer: 1min, 2min, 3min, etc.
+                # Exponential defer with jitter: ~1min, ~2min, ~4min ... capped at 1h
+                next_retry_time = attempt_time + min(DEFER_BACKOFF_MAX, DEFER_BACKOFF_BASE * (2 ** (defer_count - 1))) + random.random() * DEFER_BACKOFF_JITTER
                 update_message_delivery_status(message_id, status='queued', defer_count=defer_count,
-                                            next_retry_time=next_retry_time, error_message=error_msg)
-                logger.info(f"System: Message {message_id} deferred after {current_attempt_count} attempts, next retry at {time.ctime(next_retry_time)}")
+                                            next_retry_time=next_retry_time, error_message=error_msg,
+                                            attempt_count=current_attempt_count, last_attempt_time=attempt_time)
+                logger.info("System: Message %s deferred after %s attempts, next retry at %s", message_id, current_attempt_count, time.ctime(next_retry_time))
                 return False
             elif current_attempt_count >= max_total_attempts:
                 # All attempts exhausted, mark as undelivered
-                update_message_delivery_status(message_id, status='undelivered', error_message=error_msg)
-                logger.error(f"System: Message {message_id} undelivered after {max_total_attempts} total attempts")
+                update_message_delivery_status(message_id, status='undelivered', error_message=error_msg,
+                                            attempt_count=current_attempt_count, last_attempt_time=attempt_time)
+                logger.error("System: Message %s undelivered after %s total attempts", message_id, max_total_attempts)
                 return False
             else:
                 # Still in direct retry phase, use exponential backoff
+                update_message_delivery_status(message_id, attempt_count=current_attempt_count, last_attempt_time=attempt_time, error_message=error_msg)
                 if attempt < max_total_attempts - 1:
                     backoff_time = 2 ** attempt  # 1s, 2s, 4s
-                    logger.info(f"System: Retrying message {message_id} in {backoff_time} seconds")
+                    logger.info("System: Retrying message %s in %s seconds", message_id, backoff_time)
                     time.sleep(backoff_time)
 
     # Should not reach here, but just in case
     update_message_delivery_status(message_id, status='undelivered', error_message="Max attempts reached")
-    logger.error(f"System: Message {message_id} undelivered after reaching max attempts")
+    logger.error("System: Message %s undelivered after reaching max attempts", message_id)
     return False
 
 def resend_undelivered_messages(node_id, nodeInt=1):
     """Resend undelivered and queued messages to a specific node."""
     try:
         # Skip resending to own nodes
-        bot_node_ids = [globals().get(f'myNodeNum{i}') for i in range(1, 10) if globals().get(f'myNodeNum{i}') is not None]
-        if int(node_id) in bot_node_ids:
-            logger.debug(f"System: Skipping resend to own node {node_id}")
+        if int(node_id) in BOT_NODES:
+            logger.debug("System: Skipping resend to own node %s", node_id)
             return
 
         # Check if recipient node is online using improved detection (last heard within 2 hours)
         if not is_node_online(int(node_id), nodeInt):
-            logger.debug(f"System: Node {node_id} is offline (last heard > 2 hours ago), skipping resend")
+            logger.debug("System: Node %s is offline (last heard > 2 hours ago), skipping resend", node_id)
             return
 
-        # Get 'sent' messages older than 30s with attempt_count < 3
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM messages WHERE status = 'sent' AND delivered = 0 AND timestamp < ? AND attempt_count < 3 AND to_node_id = ?", (time.time() - 30, str(node_id)))
-        sent_messages = [dict(zip([column[0] for column in cursor.description], row)) for row in cursor.fetchall()]
-
-        # Get 'queued' messages with attempt_count < 9 and next_retry_time <= current time
-        cursor.execute("SELECT * FROM messages WHERE status = 'queued' AND attempt_count < 9 AND to_node_id = ? AND (next_retry_time IS NULL OR next_retry_time <= ?)", (str(node_id), time.time()))
-        queued_messages = [dict(zip([column[0] for column in cursor.description], row)) for row in cursor.fetchall()]
-        conn.close()
+        # Get 'sent' messages older than 30s with attempt_count < 3 and 'queued' messages
+        # with attempt_count < 9 and next_retry_time <= current time in a single query
+        cursor = get_thread_db_cursor()
+        # Rows support name-based access directly, no per-row dict needs to be built
+        cursor.row_factory = sqlite3.Row
+        now = time.time()
+        cursor.execute(RESEND_MESSAGES_SQL, (str(node_id), now - 30, now))
+        sent_messages = []
+        queued_messages = []
+        for msg in cursor.fetchall():
+            if msg['status'] == 'sent':
+                sent_messages.append(msg)
+            else:
+                queued_messages.append(msg)
 
         all_messages = sent_messages + queued_messages
 
         if not all_messages:
-            logger.debug(f"System: No undelivered or queued messages for node {node_id}")
+            logger.debug("System: No undelivered or queued messages for node %s", node_id)
             return
 
-        logger.info(f"System: Resending {len(all_messages)} messages (sent: {len(sent_messages)}, queued: {len(queued_messages)}) to node {node_id}")
+        logger.info("System: Resending %s messages (sent: %s, queued: %s) to node %s", len(all_messages), len(sent_messages), len(queued_messages), node_id)
 
-        for msg in all_messages:
-            if msg['status'] == 'sent':
-                # Resend 'sent' message
-                truncated_text = msg['text'][:50] + "..." if len(msg['text']) > 50 else msg['text']
-                logger.debug(f"System: Attempting to resend sent message {msg['message_id']} (attempt {msg['attempt_count'] + 1}/3) to node {node_id}: channel={msg['channel']}, text='{truncated_text}'")
-
-                ch = int(msg['channel']) if msg['channel'].isdigit() else 0
-                success = send_message(msg['text'], ch, int(msg['to_node_id']), nodeInt, bypassChuncking=True, resend_existing=True, existing_message_id=msg['message_id'])
-                if success:
-                    update_message_delivery_status(msg['message_id'], delivered=True)
-                    logger.info(f"System: Successfully resent sent message {msg['message_id']} to node {node_id}")
-                else:
-                    # Check if attempt_count >= 3
-                    updated_msg = get_message_by_id(msg['message_id'])
-                    if updated_msg and updated_msg['attempt_count'] >= 3:
-                        update_message_delivery_status(msg['message_id'], status='queued')
-                        logger.info(f"System: Changed sent message {msg['message_id']} to queued after 3 attempts")
-
-            elif msg['status'] == 'queued':
-                # Resend 'queued' message if online
-                if is_node_online(int(msg['to_node_id']), nodeInt):
-                    truncated_text = msg['text'][:50] + "..." if len(msg['text']) > 50 else msg['text']
-                    logger.debug(f"System: Attempting to resend queued message {msg['message_id']} (attempt {msg['attempt_count'] + 1}/9) to node {node_id}: channel={msg['channel']}, text='{truncated_text}'")
+        # Failed resends are written back in one batch: (status, attempt_count, message_id)
+        failed_updates = []
+        # Resent 'sent' messages are confirmed delivered in one statement after the loop
+        delivered_ids = []
+        try:
+            for msg in all_messages:
+                if msg['status'] == 'sent':
+                    # Resend 'sent' message
+                    if logger.isEnabledFor(logging.DEBUG):
+                        truncated_text = msg['text'][:50] + "..." if len(msg['text']) > 50 else msg['text']
+                        logger.debug("System: Attempting to resend sent message %s (attempt %s/3) to node %s: channel=%s, text='%s'", msg['message_id'], msg['attempt_count'] + 1, node_id, msg['channel'], truncated_text)
+
+                    ch = int(msg['channel']) if msg['channel'].isdigit() else 0
+                    success = send_message(msg['text'], ch, int(msg['to_node_id']), nodeInt, bypassChuncking=True, resend_existing=True, existing_message_id=msg['message_id'])
+                    if success:
+                        delivered_ids.append(msg['message_id'])
+                    else:
+                        # Check if attempt_count >= 3
+                        updated_msg = get_message_by_id(msg['message_id'])
+                        if updated_msg and updated_msg['attempt_count'] >= 3:
+                            failed_updates.append(('queued', None, msg['message_id']))
+                            logger.info("System: Changed sent message %s to queued after 3 attempts", msg['message_id'])
+
+                elif msg['status'] == 'queued':
+                    # Resend 'queued' message, the node was confirmed online above
+                    if logger.isEnabledFor(logging.DEBUG):
+                        truncated_text = msg['text'][:50] + "..." if len(msg['text']) > 50 else msg['text']
+                        logger.debug("System: Attempting to resend queued message %s (attempt %s/9) to node %s: channel=%s, text='%s'", msg['message_id'], msg['attempt_count'] + 1, node_id, msg['channel'], truncated_text)
 
                     ch = int(msg['channel']) if msg['channel'].isdigit() else 0
                     success = send_message(msg['text'], ch, int(msg['to_node_id']), nodeInt, bypassChuncking=True, resend_existing=True, existing_message_id=msg['message_id'])
                     if success:
                         delete_message(msg['message_id'])
-                        logger.info(f"System: Successfully resent queued message {msg['message_id']} to node {node_id}, deleted original")
+                        logger.info("System: Successfully resent queued message %s to node %s, deleted original", msg['message_id'], node_id)
                     else:
                         # Increment attempt_count
-                        update_message_delivery_status(msg['message_id'], attempt_count=msg['attempt_count'] + 1)
-                        logger.warning(f"System: Failed to resend queued message {msg['message_id']} to node {node_id}, incremented attempt_count to {msg['attempt_count'] + 1}")
-                else:
-                    logger.debug(f"System: Node {node_id} still offline, skipping queued message {msg['message_id']}")
+                        failed_updates.append((None, msg['attempt_count'] + 1, msg['message_id']))
+                        logger.warning("System: Failed to resend queued message %s to node %s, incremented attempt_count to %s", msg['message_id'], node_id, msg['attempt_count'] + 1)
+        finally:
+            # Write back what was collected even if a resend raised part-way through,
+            # so messages that really went out are not resent on the next pass
+            try:
+                bulk_update_message_delivery_status(failed_updates)
+            finally:
+                for message_id in mark_messages_delivered(delivered_ids):
+                    logger.info("System: Successfully resent sent message %s to node %s", message_id, node_id)
 
     except Exception as e:
-        logger.error(f"System: Error resending messages to node {node_id}: {e}")
+        logger.error("System: Error resending messages to node %s: %s", node_id, e)
+
+def resend_worker_loop():
+    """Run queued resend passes one at a time on the resend worker thread."""
+    while True:
+        request = resend_requests.get()
+        with resend_pending_lock:
+            resend_pending.discard(request)
+        resend_undelivered_messages(*request)
+
+def queue_resend(node_id, nodeInt=1):
+    """Schedule a resend pass for a node on the resend worker thread and return immediately."""
+    global resend_worker
+    request = (int(node_id), nodeInt)
+    with resend_pending_lock:
+        # A pass already waiting for this node will pick up the same messages
+        if request in resend_pending:
+            return
+        resend_pending.add(request)
+        if resend_worker is None:
+            resend_worker = threading.Thread(target=resend_worker_loop, name="resend-worker", daemon=True)
+            resend_worker.start()
+    resend_requests.put(request)
 
 def get_wikipedia_summary(search_term):
     wikipedia_search = wikipedia.search(search_term, results=3)
@@ -1191,8 +1333,8 @@ def consumeMetadata(packet, rxNode=0):
                         logger.error(f"System: Failed to update telemetry timestamp for node {nodeID}: {e}")
 
                     # Node is online, try to resend undelivered messages (skip for bot's own nodes)
-                    if nodeID not in [globals().get(f'myNodeNum{i}') for i in range(1, 10) if globals().get(f'myNodeNum{i}') is not None]:
-                        resend_undelivered_messages(nodeID, rxNode)
+                    if nodeID not in BOT_NODES:
+                        queue_resend(nodeID, rxNode)
         
         # POSITION_APP packets
         if packet_type == 'POSITION_APP':
@@ -1385,7 +1527,9 @@ def get_sysinfo(nodeID=0, deviceID=1):
 async def BroadcastScheduler():
     # handle schedule checks for the broadcast of messages
     while True:
-        schedule.run_pending()
+        # scheduled jobs call send_message, whose chunk delays and retry backoff sleep;
+        # run them in a worker thread so they do not stall the event loop
+        await asyncio.to_thread(schedule.run_pending)
         await asyncio.sleep(1)
 
 async def handleSignalWatcher():
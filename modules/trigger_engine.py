@@ -8,12 +8,94 @@ Handles position processing, zone detection with hysteresis, and trigger matchin
 import logging
 import time
 import math
-from typing import Dict, List, Tuple, Optional, Any
-from dataclasses import dataclass
+from typing import Dict, List, Tuple, Optional, Any, Iterable, Sequence
+from collections import defaultdict
+from dataclasses import dataclass, field
 from webui.db_handler import get_db_connection
 
+# Optional import for numpy (vectorized batch distance checks)
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+# Optional import for numba (compiled zone membership kernel)
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    njit = None
+    NUMBA_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Earth's radius in meters
+EARTH_RADIUS = 6371000
+
+# Meters covered by one degree of latitude
+METERS_PER_DEGREE_LAT = EARTH_RADIUS * math.pi / 180
+
+# Smallest latitude stripe height (degrees) used by the zone index
+MIN_STRIPE_DEG = 0.01
+
+def _haversine_rad(lat1_rad: float, lon1_rad: float, coslat1: float,
+                   lat2_rad: float, lon2_rad: float, coslat2: float) -> float:
+    """Haversine distance in meters between two points given in radians, with their cos(latitude)."""
+    dlat = lat2_rad - lat1_rad
+    dlon = lon2_rad - lon1_rad
+
+    a = math.sin(dlat/2)**2 + coslat1 * coslat2 * math.sin(dlon/2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    return EARTH_RADIUS * c
+
+def _haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Haversine distance in meters between two points given in degrees."""
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    return _haversine_rad(lat1_rad, math.radians(lon1), math.cos(lat1_rad),
+                          lat2_rad, math.radians(lon2), math.cos(lat2_rad))
+
+def _zone_membership_loop(lats_rad, lons_rad, zone_rlats, zone_rlons, zone_coslats, zone_radii):
+    """Membership matrix of positions against zones, one haversine per pair; only run compiled by numba."""
+    inside = np.empty((lats_rad.shape[0], zone_rlats.shape[0]), dtype=np.bool_)
+    for i in range(lats_rad.shape[0]):
+        coslat = math.cos(lats_rad[i])
+        for j in range(zone_rlats.shape[0]):
+            distance = _haversine_rad_compiled(lats_rad[i], lons_rad[i], coslat,
+                                               zone_rlats[j], zone_rlons[j], zone_coslats[j])
+            inside[i, j] = distance <= zone_radii[j]
+    return inside
+
+def _zone_membership_numpy(lats_rad, lons_rad, zone_rlats, zone_rlons, zone_coslats, zone_radii):
+    """Membership matrix of positions against zones, broadcast with numpy."""
+    lat = lats_rad[:, None]
+    lon = lons_rad[:, None]
+    dlat = zone_rlats - lat
+    dlon = zone_rlons - lon
+
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat) * zone_coslats * np.sin(dlon / 2) ** 2
+    distances = EARTH_RADIUS * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return distances <= zone_radii
+
+# Membership kernel used by TriggerEngine._batch_zone_membership, None without numpy.
+# Single-point checks stay on the plain-Python _haversine_rad; compiled, they only save
+# about 0.3us a call. The batch kernel is compiled once, see _warm_zone_membership().
+if NUMBA_AVAILABLE:
+    _haversine_rad_compiled = njit(_haversine_rad)
+    _zone_membership = njit(_zone_membership_loop)
+elif NUMPY_AVAILABLE:
+    _zone_membership = _zone_membership_numpy
+else:
+    _zone_membership = None
+
+def _warm_zone_membership() -> None:
+    """Compile the numba membership kernel now instead of inside the first position batch."""
+    if NUMBA_AVAILABLE and not _zone_membership.signatures:
+        empty = np.empty(0)
+        _zone_membership(empty, empty, empty, empty, empty, empty)
+
 @dataclass
 class Position:
     """Represents a geographic position."""
@@ -32,6 +114,16 @@ class Zone:
     radius: float
     active: bool = True
 
+    # Center in radians and cos(latitude), cached for distance checks
+    _rlat: float = field(init=False, repr=False, compare=False)
+    _rlon: float = field(init=False, repr=False, compare=False)
+    _coslat: float = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._rlat = math.radians(self.latitude)
+        self._rlon = math.radians(self.longitude)
+        self._coslat = math.cos(self._rlat)
+
 @dataclass
 class Trigger:
     """Represents a zone trigger."""
@@ -58,6 +150,17 @@ class TriggerEngine:
         self.node_zone_states: Dict[str, Dict[int, bool]] = {}  # node_id -> {zone_id -> is_inside}
         self.zones: Dict[int, Zone] = {}
         self.triggers: Dict[int, Trigger] = {}
+        self._zone_list: List[Zone] = []
+        self._zone_order: Dict[int, int] = {}  # zone_id -> position in _zone_list
+        self._zone_stripes: Dict[int, List[Zone]] = {}  # latitude stripe -> zones centered in it
+        self._stripe_deg = MIN_STRIPE_DEG
+        # Zone centers and radii for the numpy batch path; empty until zones load
+        if NUMPY_AVAILABLE:
+            self._zone_rlats = np.empty(0)
+            self._zone_rlons = np.empty(0)
+            self._zone_coslats = np.empty(0)
+            self._zone_radii = np.empty(0)
+        _warm_zone_membership()
 
         self._load_zones()
         self._load_triggers()
@@ -86,6 +189,7 @@ class TriggerEngine:
                 )
                 self.zones[zone.id] = zone
 
+            self._build_zone_arrays()
             logger.info(f"Loaded {len(self.zones)} active zones")
 
         except Exception as e:
@@ -125,11 +229,66 @@ class TriggerEngine:
         finally:
             conn.close()
 
+    def _build_zone_arrays(self):
+        """Cache zone centers and radii for the stripe index and batch distance checks."""
+        self._zone_list = list(self.zones.values())
+        self._zone_order = {zone.id: index for index, zone in enumerate(self._zone_list)}
+
+        # Stripes are at least as tall as the largest radius, so any zone that
+        # can contain a position is centered in its stripe or a neighbour
+        max_radius = max((zone.radius for zone in self._zone_list), default=0)
+        self._stripe_deg = max(max_radius / METERS_PER_DEGREE_LAT, MIN_STRIPE_DEG)
+        stripes = defaultdict(list)
+        for zone in self._zone_list:
+            stripes[self._stripe_of(zone.latitude)].append(zone)
+        self._zone_stripes = dict(stripes)
+
+        if NUMPY_AVAILABLE:
+            self._zone_rlats = np.array([zone._rlat for zone in self._zone_list], dtype=float)
+            self._zone_rlons = np.array([zone._rlon for zone in self._zone_list], dtype=float)
+            self._zone_coslats = np.array([zone._coslat for zone in self._zone_list], dtype=float)
+            self._zone_radii = np.array([zone.radius for zone in self._zone_list], dtype=float)
+
+    def _stripe_of(self, latitude: float) -> int:
+        """Return the zone index stripe a latitude falls in."""
+        return math.floor(latitude / self._stripe_deg)
+
+    def _candidate_zones(self, node_id: str, position: Position) -> List[Zone]:
+        """
+        Return the zones whose state can change for this position.
+
+        That is every zone centered in the position's latitude stripe or the
+        stripes either side, plus any zone the node is currently inside so
+        that exits are still detected after a long jump.
+        """
+        latitude = getattr(position, 'latitude', None)
+        if latitude is None or not math.isfinite(latitude):
+            # Nothing to index on; let the full scan decide
+            return list(self.zones.values())
+
+        stripe = self._stripe_of(latitude)
+        candidates = {}
+        for key in (stripe - 1, stripe, stripe + 1):
+            for zone in self._zone_stripes.get(key, ()):
+                candidates[zone.id] = zone
+
+        for zone_id, is_inside in self.node_zone_states.get(node_id, {}).items():
+            if is_inside and zone_id in self.zones:
+                candidates[zone_id] = self.zones[zone_id]
+
+        # Keep the load order so events come out as a full scan would emit them
+        return sorted(candidates.values(), key=lambda zone: self._zone_order.get(zone.id, 0))
+
     def reload_configuration(self):
         """Reload zones and triggers from database."""
         self._load_zones()
         self._load_triggers()
 
+    def clear_runtime_state(self):
+        """Forget all node positions and zone states, keeping loaded zones and triggers."""
+        self.node_positions.clear()
+        self.node_zone_states.clear()
+
     def calculate_distance(self, pos1: Position, pos2: Position) -> float:
         """
         Calculate distance between two positions using Haversine formula.
@@ -137,24 +296,20 @@ class TriggerEngine:
         Returns:
             Distance in meters
         """
-        # Convert to radians
-        lat1_rad = math.radians(pos1.latitude)
-        lon1_rad = math.radians(pos1.longitude)
-        lat2_rad = math.radians(pos2.latitude)
-        lon2_rad = math.radians(pos2.longitude)
+        return _haversine(pos1.latitude, pos1.longitude, pos2.latitude, pos2.longitude)
 
-        # Haversine formula
-        dlat = lat2_rad - lat1_rad
-        dlon = lon2_rad - lon1_rad
-
-        a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    def distance_to_zone(self, position: Position, zone: Zone) -> float:
+        """
+        Calculate distance from a position to a zone center.
 
-        # Earth's radius in meters
-        earth_radius = 6371000
-        distance = earth_radius * c
+        Uses the zone's cached radians and cos(latitude).
 
-        return distance
+        Returns:
+            Distance in meters
+        """
+        lat_rad = math.radians(position.latitude)
+        return _haversine_rad(lat_rad, math.radians(position.longitude), math.cos(lat_rad),
+                              zone._rlat, zone._rlon, zone._coslat)
 
     def is_position_in_zone(self, position: Position, zone: Zone) -> bool:
         """
@@ -167,9 +322,7 @@ class TriggerEngine:
         Returns:
             True if position is inside zone
         """
-        zone_center = Position(zone.latitude, zone.longitude)
-        distance = self.calculate_distance(position, zone_center)
-        return distance <= zone.radius
+        return self.distance_to_zone(position, zone) <= zone.radius
 
     def process_position_update(self, node_id: str, position: Position) -> List[Dict[str, Any]]:
         """
@@ -182,6 +335,57 @@ class TriggerEngine:
         Returns:
             List of triggered events
         """
+        zone_states = [(zone, self.is_position_in_zone(position, zone))
+                       for zone in self._candidate_zones(node_id, position)]
+        return self._apply_zone_states(node_id, position, zone_states)
+
+    def process_position_updates_batch(self, node_ids: Sequence[str], latitudes: Sequence[float],
+                                       longitudes: Sequence[float],
+                                       timestamps: Optional[Sequence[float]] = None) -> List[Dict[str, Any]]:
+        """
+        Process many position updates at once and detect zone events.
+
+        Zone membership for every update is computed in one pass (vectorized
+        when numpy is available); the updates are then applied in order, so
+        the result matches calling process_position_update for each one.
+
+        Args:
+            node_ids: Node identifier of each update
+            latitudes: Latitude of each update
+            longitudes: Longitude of each update
+            timestamps: Optional timestamp of each update
+
+        Returns:
+            List of triggered events across all updates
+        """
+        if timestamps is None:
+            timestamps = [None] * len(node_ids)
+
+        inside_rows = self._batch_zone_membership(latitudes, longitudes)
+
+        events = []
+        for node_id, lat, lon, ts, inside in zip(node_ids, latitudes, longitudes, timestamps, inside_rows):
+            position = Position(float(lat), float(lon), timestamp=None if ts is None else float(ts))
+            events.extend(self._apply_zone_states(node_id, position, zip(self._zone_list, inside)))
+        return events
+
+    def _batch_zone_membership(self, latitudes: Sequence[float], longitudes: Sequence[float]) -> List[List[bool]]:
+        """Return, for each position, whether it lies inside each cached zone."""
+        if _zone_membership is None:
+            return [
+                [self.is_position_in_zone(Position(lat, lon), zone) for zone in self._zone_list]
+                for lat, lon in zip(latitudes, longitudes)
+            ]
+
+        inside = _zone_membership(np.radians(np.asarray(latitudes, dtype=np.float64)),
+                                  np.radians(np.asarray(longitudes, dtype=np.float64)),
+                                  self._zone_rlats, self._zone_rlons,
+                                  self._zone_coslats, self._zone_radii)
+        return inside.tolist()
+
+    def _apply_zone_states(self, node_id: str, position: Position,
+                           zone_states: Iterable[Tuple[Zone, bool]]) -> List[Dict[str, Any]]:
+        """Record a node position and turn zone membership changes into events."""
         events = []
 
         # Store current position
@@ -192,8 +396,7 @@ class TriggerEngine:
             self.node_zone_states[node_id] = {}
 
         # Check each active zone
-        for zone in self.zones.values():
-            current_in_zone = self.is_position_in_zone(position, zone)
+        for zone, current_in_zone in zone_states:
             previous_in_zone = self.node_zone_states[node_id].get(zone.id, False)
 
             # Apply hysteresis to prevent oscillation
@@ -242,11 +445,10 @@ class TriggerEngine:
             return False
 
         previous_position = self.node_positions[node_id]
-        zone_center = Position(zone.latitude, zone.longitude)
 
         # Calculate distances from zone center
-        prev_distance = self.calculate_distance(previous_position, zone_center)
-        curr_distance = self.calculate_distance(position, zone_center)
+        prev_distance = self.distance_to_zone(previous_position, zone)
+        curr_distance = self.distance_to_zone(position, zone)
 
         # If we're entering and previous position was within hysteresis distance of boundary
         if current_in_zone and prev_distance > zone.radius and prev_distance <= zone.radius + self.hysteresis_distance:
@@ -336,15 +538,14 @@ class TriggerEngine:
         """Clean up old node zone states to prevent memory leaks."""
         cutoff_time = time.time() - (max_age_hours * 3600)
 
-        # Remove old positions
-        to_remove = []
-        for node_id, position in self.node_positions.items():
-            if position.timestamp and position.timestamp < cutoff_time:
-                to_remove.append(node_id)
+        # Remove old positions; a missing position carries nothing worth keeping
+        to_remove = [
+            node_id for node_id, position in self.node_positions.items()
+            if position is None or (position.timestamp and position.timestamp < cutoff_time)
+        ]
 
         for node_id in to_remove:
             del self.node_positions[node_id]
-            if node_id in self.node_zone_states:
-                del self.node_zone_states[node_id]
+            self.node_zone_states.pop(node_id, None)
 
         logger.debug(f"Cleaned up states for {len(to_remove)} old nodes")
\ No newline at end of file
@@ -280,6 +280,9 @@ def onReceive(packet, interface):
     # set the message_from_id
     message_from_id = packet['from']
 
+    # The node was just heard, whatever the packet type; any cached offline answer is stale
+    record_node_heard(message_from_id, rxNode, packet.get('rxTime'))
+
     # check if the packet has a channel flag use it
     if packet.get('channel'):
         channel_number = packet.get('channel', 0)
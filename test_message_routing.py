@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
 Test script to validate message routing fixes between Telegram and Meshtastic.
+
+Usage:
+    python test_message_routing.py [--verbose]
 """
 
 import asyncio
@@ -11,8 +14,44 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from modules.meshgram_integration.config_manager import ConfigManager
 from modules import log
 
+# (channel, expected_broadcast, description)
+ROUTING_CASES = (
+    (0, True, "Default channel message"),
+    (1, False, "Different channel message"),
+    (2, False, "Another channel message"),
+)
+ROUTING_CHANNELS = tuple(case[0] for case in ROUTING_CASES)
+ROUTING_EXPECTED = tuple(case[1] for case in ROUTING_CASES)
+
+# (text, should_filter, description)
+TELEMETRY_CASES = (
+    ("Hello world", False, "Regular message"),
+    ("Battery level is 85%", True, "Battery telemetry"),
+    ("Temperature is 23°C", True, "Temperature telemetry"),
+    ("Channel utilization: 45%", True, "Channel utilization"),
+    ("Device metrics: voltage=3.7V", True, "Device metrics"),
+)
+TELEMETRY_TEXTS = tuple(case[0] for case in TELEMETRY_CASES)
+TELEMETRY_EXPECTED = tuple(case[1] for case in TELEMETRY_CASES)
+
+# Mock message processor for testing
+class MockProcessor:
+    def __init__(self, config):
+        self.config = config
+
+    def _is_telemetry_data(self, text: str) -> bool:
+        """Check if the message contains telemetry data that should be excluded from channel 0 broadcasts."""
+        telemetry_keywords = [
+            'battery', 'voltage', 'temperature', 'humidity', 'barometer',
+            'iaq', 'distance', 'current', 'power', 'energy', 'rssi',
+            'snr', 'device metrics', 'air util', 'channel util'
+        ]
+        text_lower = text.lower()
+        return any(keyword in text_lower for keyword in telemetry_keywords)
+
 class MessageRoutingTester:
-    def __init__(self):
+    def __init__(self, verbose: bool = False):
+        self.verbose = verbose
         self.config = ConfigManager()
         self.logger = log.logger
 
@@ -45,74 +84,41 @@ class MessageRoutingTester:
         """Test the channel routing logic."""
         print("\n🔀 Testing channel routing logic...")
 
-        # Simulate different channel scenarios
-        test_cases = [
-            {"channel": 0, "expected_broadcast": True, "description": "Default channel message"},
-            {"channel": 1, "expected_broadcast": False, "description": "Different channel message"},
-            {"channel": 2, "expected_broadcast": False, "description": "Another channel message"},
-        ]
-
         default_channel = self.config.get('telegram.telegram_default_channel', 0)
+        # Ensure both are integers for proper comparison
+        default_channel_int = int(default_channel) if default_channel is not None else 0
 
-        for test_case in test_cases:
-            channel = test_case["channel"]
-            # Ensure both are integers for proper comparison
-            channel_int = int(channel)
-            default_channel_int = int(default_channel) if default_channel is not None else 0
-            should_broadcast = (channel_int == default_channel_int)  # Only broadcast messages from the configured default channel
-            expected = test_case["expected_broadcast"]
-
-            print(f"Debug: channel={channel_int}, default_channel={default_channel_int}, should_broadcast={should_broadcast}, expected={expected}")
+        # Only broadcast messages from the configured default channel
+        actual = tuple(channel == default_channel_int for channel in ROUTING_CHANNELS)
 
-            if should_broadcast == expected:
-                print(f"✅ {test_case['description']}: Channel {channel} -> Broadcast: {should_broadcast}")
-            else:
-                print(f"❌ {test_case['description']}: Channel {channel} -> Expected: {expected}, Got: {should_broadcast}")
-                return False
+        if actual == ROUTING_EXPECTED:
+            if self.verbose:
+                for (channel, _, description), should_broadcast in zip(ROUTING_CASES, actual):
+                    print(f"✅ {description}: Channel {channel} -> Broadcast: {should_broadcast}")
+            return True
 
-        return True
+        for (channel, expected, description), should_broadcast in zip(ROUTING_CASES, actual):
+            if should_broadcast != expected:
+                print(f"❌ {description}: Channel {channel} -> Expected: {expected}, Got: {should_broadcast}")
+        return False
 
     def test_telemetry_filtering(self):
         """Test that telemetry data is properly filtered."""
         print("\n📊 Testing telemetry filtering...")
 
-        # Mock message processor for testing
-        class MockProcessor:
-            def __init__(self, config):
-                self.config = config
-
-            def _is_telemetry_data(self, text: str) -> bool:
-                """Check if the message contains telemetry data that should be excluded from channel 0 broadcasts."""
-                telemetry_keywords = [
-                    'battery', 'voltage', 'temperature', 'humidity', 'barometer',
-                    'iaq', 'distance', 'current', 'power', 'energy', 'rssi',
-                    'snr', 'device metrics', 'air util', 'channel util'
-                ]
-                text_lower = text.lower()
-                return any(keyword in text_lower for keyword in telemetry_keywords)
-
         processor = MockProcessor(self.config)
+        actual = tuple(processor._is_telemetry_data(text) for text in TELEMETRY_TEXTS)
 
-        test_messages = [
-            {"text": "Hello world", "should_filter": False, "description": "Regular message"},
-            {"text": "Battery level is 85%", "should_filter": True, "description": "Battery telemetry"},
-            {"text": "Temperature is 23°C", "should_filter": True, "description": "Temperature telemetry"},
-            {"text": "Channel utilization: 45%", "should_filter": True, "description": "Channel utilization"},
-            {"text": "Device metrics: voltage=3.7V", "should_filter": True, "description": "Device metrics"},
-        ]
-
-        all_passed = True
-        for test_msg in test_messages:
-            is_telemetry = processor._is_telemetry_data(test_msg["text"])
-            expected = test_msg["should_filter"]
-
-            if is_telemetry == expected:
-                print(f"✅ {test_msg['description']}: '{test_msg['text']}' -> Filtered: {is_telemetry}")
-            else:
-                print(f"❌ {test_msg['description']}: '{test_msg['text']}' -> Expected: {expected}, Got: {is_telemetry}")
-                all_passed = False
+        if actual == TELEMETRY_EXPECTED:
+            if self.verbose:
+                for (text, _, description), is_telemetry in zip(TELEMETRY_CASES, actual):
+                    print(f"✅ {description}: '{text}' -> Filtered: {is_telemetry}")
+            return True
 
-        return all_passed
+        for (text, expected, description), is_telemetry in zip(TELEMETRY_CASES, actual):
+            if is_telemetry != expected:
+                print(f"❌ {description}: '{text}' -> Expected: {expected}, Got: {is_telemetry}")
+        return False
 
     def run_all_tests(self):
         """Run all tests and return overall result."""
@@ -144,7 +150,15 @@ class MessageRoutingTester:
 
 async def main():
     """Main test function."""
-    tester = MessageRoutingTester()
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Test message routing between Telegram and Meshtastic')
+    parser.add_argument('--verbose', '-v', action='store_true',
+                       help='Print every passing case, not only failures')
+
+    args = parser.parse_args()
+
+    tester = MessageRoutingTester(verbose=args.verbose)
     success = tester.run_all_tests()
     return 0 if success else 1
 
@@ -7,9 +7,11 @@ check attempt_count increments, status changes, and prevent infinite retries.
 
 import unittest
 import unittest.mock as mock
+import logging
 import sqlite3
 import os
 import sys
+import tempfile
 import time
 import uuid
 from unittest.mock import MagicMock, patch
@@ -21,7 +23,9 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'webui'))
 # Import only the db functions to test
 from webui.db_handler import (
     save_message, update_message_delivery_status, get_undelivered_messages,
-    get_queued_messages, get_message_by_id, delete_message, get_db_connection
+    get_queued_messages, get_message_by_id, delete_message, get_db_connection,
+    bulk_update_message_delivery_status, mark_messages_delivered,
+    CONNECTION_PRAGMAS
 )
 
 # Import the logic we need to test by copying the functions
@@ -36,36 +40,57 @@ import io
 import uuid
 import time
 
+# Backoff for deferred messages, in seconds
+DEFER_BACKOFF_BASE = 60
+DEFER_BACKOFF_MAX = 3600
+DEFER_BACKOFF_JITTER = 30
+
+logger = logging.getLogger(__name__)
+
 # Mock the interface globals
 interface1 = None
 myNodeNum1 = 11111111
 
+# Copy the get_node_by_num function
+def get_node_by_num(node_id, nodeInt=1):
+    """Look up a node in the interface nodeDB by its number."""
+    interface = globals()[f'interface{nodeInt}']
+    # meshtastic already keeps a num -> node map alongside interface.nodes
+    nodes_by_num = getattr(interface, 'nodesByNum', None)
+    if isinstance(nodes_by_num, dict):
+        return nodes_by_num.get(node_id)
+
+    # Interfaces without nodesByNum: scan the nodeDB
+    if interface.nodes:
+        for node in interface.nodes.values():
+            if node.get('num') == node_id:
+                return node
+    return None
+
 # Copy the is_node_online function
 def is_node_online(node_id, nodeInt=1, use_ping=False):
     """Check if a node is online based on last heard time (within 2 hours) and optionally ping."""
     interface = globals()[f'interface{nodeInt}']
 
-    if interface.nodes:
-        for node in interface.nodes.values():
-            if node['num'] == node_id:
-                last_heard = node.get('lastHeard', 0)
-                # Check if last heard within 2 hours (7200 seconds)
-                if last_heard and (time.time() - last_heard) <= 7200:
+    node = get_node_by_num(node_id, nodeInt)
+    if node is not None:
+        last_heard = node.get('lastHeard', 0)
+        # Check if last heard within 2 hours (7200 seconds)
+        if last_heard and (time.time() - last_heard) <= 7200:
+            return True
+        elif use_ping:
+            # Attempt ping if available and last heard check failed
+            try:
+                logger.debug("System: Attempting ping for node %s on interface %s", node_id, nodeInt)
+                # Meshtastic interface has ping method
+                ping_result = interface.ping(node_id, wantAck=True)
+                if ping_result:
+                    logger.debug("System: Ping successful for node %s", node_id)
                     return True
-                elif use_ping:
-                    # Attempt ping if available and last heard check failed
-                    try:
-                        print(f"System: Attempting ping for node {node_id} on interface {nodeInt}")
-                        # Meshtastic interface has ping method
-                        ping_result = interface.ping(node_id, wantAck=True)
-                        if ping_result:
-                            print(f"System: Ping successful for node {node_id}")
-                            return True
-                        else:
-                            print(f"System: Ping failed for node {node_id}")
-                    except Exception as e:
-                        print(f"System: Ping not available or failed for node {node_id}: {e}")
-                break  # Found the node, no need to continue
+                else:
+                    logger.debug("System: Ping failed for node %s", node_id)
+            except Exception as e:
+                logger.debug("System: Ping not available or failed for node %s: %s", node_id, e)
 
     return False
 
@@ -79,7 +104,7 @@ def send_message(message, ch, nodeid=0, nodeInt=1, bypassChuncking=False, resend
 
     # Prevent sending to own node
     if nodeid != 0 and nodeid in [globals().get(f'myNodeNum{i}') for i in range(1, 10) if globals().get(f'myNodeNum{i}')]:
-        print(f"System: Attempted to send message to own node {nodeid}")
+        logger.warning("System: Attempted to send message to own node %s", nodeid)
         return False
 
     # Determine start_attempt and message_id
@@ -89,7 +114,7 @@ def send_message(message, ch, nodeid=0, nodeInt=1, bypassChuncking=False, resend
         if msg:
             start_attempt = msg['attempt_count']
         else:
-            print(f"System: Message {message_id} not found for resend")
+            logger.error("System: Message %s not found for resend", message_id)
             return False
     else:
         start_attempt = 0
@@ -105,9 +130,9 @@ def send_message(message, ch, nodeid=0, nodeInt=1, bypassChuncking=False, resend
                 timestamp = time.time()
                 try:
                     save_message(from_node_id, to_node_id, str(ch), message, timestamp, is_dm, status='queued', attempt_count=0, message_id=message_id)
-                    print(f"System: Message queued for offline recipient {nodeid}")
+                    logger.info("System: Message queued for offline recipient %s", nodeid)
                 except Exception as e:
-                    print(f"System: Failed to queue message for offline recipient {nodeid}: {e}")
+                    logger.error("System: Failed to queue message for offline recipient %s: %s", nodeid, e)
                 return False
             else:
                 # Online, save as sent
@@ -118,7 +143,7 @@ def send_message(message, ch, nodeid=0, nodeInt=1, bypassChuncking=False, resend
                 try:
                     save_message(from_node_id, to_node_id, str(ch), message, timestamp, is_dm, status='sent', attempt_count=1, message_id=message_id)
                 except Exception as e:
-                    print(f"System: Failed to save message to database: {e}")
+                    logger.error("System: Failed to save message to database: %s", e)
                     return False
         else:
             # Channel message
@@ -129,7 +154,7 @@ def send_message(message, ch, nodeid=0, nodeInt=1, bypassChuncking=False, resend
             try:
                 save_message(from_node_id, to_node_id, str(ch), message, timestamp, is_dm, status='sent', attempt_count=1, message_id=message_id)
             except Exception as e:
-                print(f"System: Failed to save message to database: {e}")
+                logger.error("System: Failed to save message to database: %s", e)
                 return False
 
     # Attempt delivery with refined retry logic: 3 attempts then defer, total 9 then undelivered
@@ -137,10 +162,10 @@ def send_message(message, ch, nodeid=0, nodeInt=1, bypassChuncking=False, resend
     max_total_attempts = 9
 
     for attempt in range(start_attempt, max_total_attempts):
+        # The attempt is recorded together with its outcome, so each attempt costs a single UPDATE
+        current_attempt_count = attempt + 1
+        attempt_time = time.time()
         try:
-            current_attempt_count = attempt + 1
-            update_message_delivery_status(message_id, attempt_count=current_attempt_count, last_attempt_time=time.time())
-
             if not bypassChuncking:
                 # Split the message into chunks if it exceeds the MESSAGE_CHUNK_SIZE
                 message_list = [message]  # Simplified for testing
@@ -149,70 +174,74 @@ def send_message(message, ch, nodeid=0, nodeInt=1, bypassChuncking=False, resend
 
             if isinstance(message_list, list):
                 # Send the message to the channel or DM
-                total_length = sum(len(chunk) for chunk in message_list)
                 num_chunks = len(message_list)
-                for m in message_list:
-                    chunkOf = f"{message_list.index(m)+1}/{num_chunks}"
+                for chunk_num, m in enumerate(message_list, start=1):
+                    chunkOf = f"{chunk_num}/{num_chunks}"
                     if nodeid == 0:
                         # Send to channel - always use ACK for delivery confirmation
-                        print(f"Device:{nodeInt} Channel:{ch} Attempt:{current_attempt_count} req.ACK Chunker{chunkOf} SendingChannel: {m.replace(chr(10), ' ')}")
+                        logger.info("Device:%s Channel:%s Attempt:%s req.ACK Chunker%s SendingChannel: %s", nodeInt, ch, current_attempt_count, chunkOf, m.replace(chr(10), ' '))
                         interface.sendText(text=m, channelIndex=ch, wantAck=True)
                     else:
                         # Send to DM - always use ACK for delivery confirmation
-                        print(f"Device:{nodeInt} Attempt:{current_attempt_count} req.ACK Chunker{chunkOf} Sending DM: {m.replace(chr(10), ' ')} To: {nodeid}")
+                        logger.info("Device:%s Attempt:%s req.ACK Chunker%s Sending DM: %s To: %s", nodeInt, current_attempt_count, chunkOf, m.replace(chr(10), ' '), nodeid)
                         interface.sendText(text=m, channelIndex=ch, destinationId=nodeid, wantAck=True)
 
                     # Throttle the message sending to prevent spamming the device
-                    if (message_list.index(m)+1) % 4 == 0:
+                    if chunk_num % 4 == 0:
                         time.sleep(1)
-                        if (message_list.index(m)+1) % 5 == 0:
-                            print(f"System: throttling rate Interface{nodeInt} on {chunkOf}")
+                        if chunk_num % 5 == 0:
+                            logger.warning("System: throttling rate Interface%s on %s", nodeInt, chunkOf)
 
                     # wait an amount of time between sending each split message
                     time.sleep(0.1)  # Reduced for testing
             else: # message is less than MESSAGE_CHUNK_SIZE characters
                 if nodeid == 0:
                     # Send to channel - always use ACK for delivery confirmation
-                    print(f"Device:{nodeInt} Channel:{ch} Attempt:{current_attempt_count} req.ACK SendingChannel: {message.replace(chr(10), ' ')}")
+                    logger.info("Device:%s Channel:%s Attempt:%s req.ACK SendingChannel: %s", nodeInt, ch, current_attempt_count, message.replace(chr(10), ' '))
                     interface.sendText(text=message, channelIndex=ch, wantAck=True)
                 else:
                     # Send to DM - always use ACK for delivery confirmation
-                    print(f"Device:{nodeInt} Attempt:{current_attempt_count} req.ACK Sending DM: {message.replace(chr(10), ' ')} To: {nodeid}")
+                    logger.info("Device:%s Attempt:%s req.ACK Sending DM: %s To: %s", nodeInt, current_attempt_count, message.replace(chr(10), ' '), nodeid)
                     interface.sendText(text=message, channelIndex=ch, destinationId=nodeid, wantAck=True)
 
             # If we reach here without exception, assume success
-            update_message_delivery_status(message_id, delivered=True, status='delivered')
-            print(f"System: Message {message_id} delivered successfully on attempt {current_attempt_count}")
+            update_message_delivery_status(message_id, delivered=True, status='delivered',
+                                        attempt_count=current_attempt_count, last_attempt_time=attempt_time)
+            logger.info("System: Message %s delivered successfully on attempt %s", message_id, current_attempt_count)
             return True
 
         except Exception as e:
             error_msg = str(e)
-            print(f"System: Delivery attempt {current_attempt_count} failed for message {message_id}: {error_msg}")
+            logger.warning("System: Delivery attempt %s failed for message %s: %s", current_attempt_count, message_id, error_msg)
 
             # After 3 direct attempts, defer the message
             if current_attempt_count >= max_direct_attempts and current_attempt_count < max_total_attempts:
                 # Defer: set status to 'queued', increment defer_count, set next_retry_time
                 defer_count = (current_attempt_count // max_direct_attempts)
-                next_retry_time = time.time() + (60 * defer_count)  # Exponential defer: 1min, 2min, 3min, etc.
+                # Exponential defer with jitter: ~1min, ~2min, ~4min ... capped at 1h
+                next_retry_time = attempt_time + min(DEFER_BACKOFF_MAX, DEFER_BACKOFF_BASE * (2 ** (defer_count - 1))) + random.random() * DEFER_BACKOFF_JITTER
                 update_message_delivery_status(message_id, status='queued', defer_count=defer_count,
-                                            next_retry_time=next_retry_time, error_message=error_msg)
-                print(f"System: Message {message_id} deferred after {current_attempt_count} attempts, next retry at {time.ctime(next_retry_time)}")
+                                            next_retry_time=next_retry_time, error_message=error_msg,
+                                            attempt_count=current_attempt_count, last_attempt_time=attempt_time)
+                logger.info("System: Message %s deferred after %s attempts, next retry at %s", message_id, current_attempt_count, time.ctime(next_retry_time))
                 return False
             elif current_attempt_count >= max_total_attempts:
                 # All attempts exhausted, mark as undelivered
-                update_message_delivery_status(message_id, status='undelivered', error_message=error_msg)
-                print(f"System: Message {message_id} undelivered after {max_total_attempts} total attempts")
+                update_message_delivery_status(message_id, status='undelivered', error_message=error_msg,
+                                            attempt_count=current_attempt_count, last_attempt_time=attempt_time)
+                logger.error("System: Message %s undelivered after %s total attempts", message_id, max_total_attempts)
                 return False
             else:
                 # Still in direct retry phase, use exponential backoff
+                update_message_delivery_status(message_id, attempt_count=current_attempt_count, last_attempt_time=attempt_time, error_message=error_msg)
                 if attempt < max_total_attempts - 1:
                     backoff_time = 2 ** attempt  # 1s, 2s, 4s
-                    print(f"System: Retrying message {message_id} in {backoff_time} seconds")
+                    logger.info("System: Retrying message %s in %s seconds", message_id, backoff_time)
                     time.sleep(backoff_time)
 
     # Should not reach here, but just in case
     update_message_delivery_status(message_id, status='undelivered', error_message="Max attempts reached")
-    print(f"System: Message {message_id} undelivered after reaching max attempts")
+    logger.error("System: Message %s undelivered after reaching max attempts", message_id)
     return False
 
 # Copy the resend_undelivered_messages function
@@ -222,68 +251,84 @@ def resend_undelivered_messages(node_id, nodeInt=1):
         # Skip resending to own nodes
         bot_node_ids = [globals().get(f'myNodeNum{i}') for i in range(1, 10) if globals().get(f'myNodeNum{i}') is not None]
         if int(node_id) in bot_node_ids:
-            print(f"System: Skipping resend to own node {node_id}")
+            logger.debug("System: Skipping resend to own node %s", node_id)
             return
 
         # Check if recipient node is online using improved detection (last heard within 2 hours)
         if not is_node_online(int(node_id), nodeInt):
-            print(f"System: Node {node_id} is offline (last heard > 2 hours ago), skipping resend")
+            logger.debug("System: Node %s is offline (last heard > 2 hours ago), skipping resend", node_id)
             return
 
-        # Get 'sent' messages older than 30s with attempt_count < 3
+        # Get 'sent' messages older than 30s with attempt_count < 3 and 'queued' messages
+        # with attempt_count < 9 in a single query
         conn = get_db_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT * FROM messages WHERE status = 'sent' AND delivered = 0 AND timestamp < ? AND attempt_count < 3 AND to_node_id = ?", (time.time() - 30, str(node_id)))
-        sent_messages = [dict(zip([column[0] for column in cursor.description], row)) for row in cursor.fetchall()]
-
-        # Get 'queued' messages with attempt_count < 9
-        cursor.execute("SELECT * FROM messages WHERE status = 'queued' AND attempt_count < 9 AND to_node_id = ?", (str(node_id),))
-        queued_messages = [dict(zip([column[0] for column in cursor.description], row)) for row in cursor.fetchall()]
+        cursor.execute("""
+            SELECT * FROM messages
+            WHERE to_node_id = ? AND (
+                (status = 'sent' AND delivered = 0 AND timestamp < ? AND attempt_count < 3)
+                OR (status = 'queued' AND attempt_count < 9)
+            )
+        """, (str(node_id), time.time() - 30))
+        columns = [column[0] for column in cursor.description]
+        sent_messages = []
+        queued_messages = []
+        for row in cursor.fetchall():
+            msg = dict(zip(columns, row))
+            if msg['status'] == 'sent':
+                sent_messages.append(msg)
+            else:
+                queued_messages.append(msg)
         conn.close()
 
         all_messages = sent_messages + queued_messages
 
         if not all_messages:
-            print(f"System: No undelivered or queued messages for node {node_id}")
+            logger.debug("System: No undelivered or queued messages for node %s", node_id)
             return
 
-        print(f"System: Resending {len(all_messages)} messages (sent: {len(sent_messages)}, queued: {len(queued_messages)}) to node {node_id}")
+        logger.info("System: Resending %s messages (sent: %s, queued: %s) to node %s", len(all_messages), len(sent_messages), len(queued_messages), node_id)
 
+        # Failed resends are written back in one batch: (status, attempt_count, message_id)
+        failed_updates = []
+        # Resent messages are confirmed delivered in one statement after the loop
+        delivered_ids = []
         for msg in all_messages:
             if msg['status'] == 'sent':
                 # Resend 'sent' message
-                truncated_text = msg['text'][:50] + "..." if len(msg['text']) > 50 else msg['text']
-                print(f"System: Attempting to resend sent message {msg['message_id']} (attempt {msg['attempt_count'] + 1}/3) to node {node_id}: channel={msg['channel']}, text='{truncated_text}'")
+                if logger.isEnabledFor(logging.DEBUG):
+                    truncated_text = msg['text'][:50] + "..." if len(msg['text']) > 50 else msg['text']
+                    logger.debug("System: Attempting to resend sent message %s (attempt %s/3) to node %s: channel=%s, text='%s'", msg['message_id'], msg['attempt_count'] + 1, node_id, msg['channel'], truncated_text)
 
                 ch = int(msg['channel']) if msg['channel'].isdigit() else 0
                 success = send_message(msg['text'], ch, int(msg['to_node_id']), nodeInt, bypassChuncking=True, resend_existing=True, existing_message_id=msg['message_id'])
                 if success:
-                    update_message_delivery_status(msg['message_id'], delivered=True)
-                    print(f"System: Successfully resent sent message {msg['message_id']} to node {node_id}")
+                    delivered_ids.append(msg['message_id'])
                 else:
-                    update_message_delivery_status(msg['message_id'], status='queued')
-                    print(f"System: Failed to resend sent message {msg['message_id']} to node {node_id}, set to queued")
+                    failed_updates.append(('queued', None, msg['message_id']))
+                    logger.info("System: Failed to resend sent message %s to node %s, set to queued", msg['message_id'], node_id)
 
             elif msg['status'] == 'queued':
-                # Resend 'queued' message if online
-                if is_node_online(int(msg['to_node_id']), nodeInt):
+                # Resend 'queued' message, the node was confirmed online above
+                if logger.isEnabledFor(logging.DEBUG):
                     truncated_text = msg['text'][:50] + "..." if len(msg['text']) > 50 else msg['text']
-                    print(f"System: Attempting to resend queued message {msg['message_id']} (attempt {msg['attempt_count'] + 1}/9) to node {node_id}: channel={msg['channel']}, text='{truncated_text}'")
+                    logger.debug("System: Attempting to resend queued message %s (attempt %s/9) to node %s: channel=%s, text='%s'", msg['message_id'], msg['attempt_count'] + 1, node_id, msg['channel'], truncated_text)
 
-                    ch = int(msg['channel']) if msg['channel'].isdigit() else 0
-                    success = send_message(msg['text'], ch, int(msg['to_node_id']), nodeInt, bypassChuncking=True, resend_existing=True, existing_message_id=msg['message_id'])
-                    if success:
-                        update_message_delivery_status(msg['message_id'], delivered=True, status='delivered')
-                        print(f"System: Successfully resent queued message {msg['message_id']} to node {node_id}, updated to delivered")
-                    else:
-                        # Increment attempt_count
-                        update_message_delivery_status(msg['message_id'], attempt_count=msg['attempt_count'] + 1)
-                        print(f"System: Failed to resend queued message {msg['message_id']} to node {node_id}, incremented attempt_count to {msg['attempt_count'] + 1}")
+                ch = int(msg['channel']) if msg['channel'].isdigit() else 0
+                success = send_message(msg['text'], ch, int(msg['to_node_id']), nodeInt, bypassChuncking=True, resend_existing=True, existing_message_id=msg['message_id'])
+                if success:
+                    delivered_ids.append(msg['message_id'])
                 else:
-                    print(f"System: Node {node_id} still offline, skipping queued message {msg['message_id']}")
+                    # Increment attempt_count
+                    failed_updates.append((None, msg['attempt_count'] + 1, msg['message_id']))
+                    logger.warning("System: Failed to resend queued message %s to node %s, incremented attempt_count to %s", msg['message_id'], node_id, msg['attempt_count'] + 1)
+
+        bulk_update_message_delivery_status(failed_updates)
+        for message_id in mark_messages_delivered(delivered_ids):
+            logger.info("System: Successfully resent message %s to node %s, updated to delivered", message_id, node_id)
 
     except Exception as e:
-        print(f"System: Error resending messages to node {node_id}: {e}")
+        logger.error("System: Error resending messages to node %s: %s", node_id, e)
 
 
 class TestMessageSending(unittest.TestCase):
@@ -293,6 +338,9 @@ class TestMessageSending(unittest.TestCase):
         """Set up test environment with mocked interface and test database."""
         # Create in-memory database for testing
         self.db_conn = sqlite3.connect(':memory:')
+        # Match the production connection tuning
+        for pragma in CONNECTION_PRAGMAS:
+            self.db_conn.execute(pragma)
 
         # Create messages table
         self.db_conn.execute('''
@@ -316,6 +364,7 @@ class TestMessageSending(unittest.TestCase):
                 defer_count INTEGER DEFAULT 0
             )
         ''')
+        self.db_conn.execute('CREATE INDEX IF NOT EXISTS idx_messages_node_status ON messages(to_node_id, status, attempt_count, timestamp)')
 
         # Create nodes table (required by save_message)
         self.db_conn.execute('''
@@ -572,5 +621,19 @@ class TestMessageSending(unittest.TestCase):
         self.assertEqual(msg[12], 1)  # attempt_count
 
 
+class TestDbConnectionPragmas(unittest.TestCase):
+    """Test the tuning applied to dashboard database connections."""
+
+    def test_db_connection_pragmas(self):
+        """Test that short-lived write connections also skip the per-commit fsync."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            conn = get_db_connection(os.path.join(tmp_dir, 'pragmas.db'))
+            try:
+                self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+                self.assertEqual(conn.execute("PRAGMA temp_store").fetchone()[0], 2)  # MEMORY
+            finally:
+                conn.close()
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
\ No newline at end of file
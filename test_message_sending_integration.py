@@ -1,11 +1,19 @@
 #!/usr/bin/env python3
 """
-Comprehensive test script for message sending functionality in meshgram integration.
+Comprehensive test suite for message sending functionality in meshgram integration.
 Tests chunking, message formatting, routing logic, and send_message_to_chat method.
+
+Usage:
+    python -m unittest test_message_sending_integration
 """
 import sys
 import os
 import asyncio
+import re
+import time
+import unittest
+from dataclasses import dataclass, field
+from functools import lru_cache
 from unittest.mock import AsyncMock, MagicMock, patch
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'modules', 'meshgram_integration'))
 
@@ -28,20 +36,27 @@ class MockConfig:
     def get_authorized_users(self):
         return self.data.get('telegram_authorized_users', [])
 
+# Chunk counter prefix such as "1/3 " at the start of a chunk
+_COUNTER_RE = re.compile(r'\d+/\d+ ')
+
+@lru_cache(maxsize=1024)
+def _parse_node_id(node_id):
+    if node_id.startswith('!'):
+        return int(node_id[1:], 16)
+    return node_id
+
+@dataclass(slots=True)
 class MockNodeManager:
-    def __init__(self):
-        self.nodes = {}
+    nodes: dict = field(default_factory=dict)
 
     def get_node_id(self, node_id):
-        if node_id.startswith('!'):
-            return int(node_id[1:], 16)
-        return node_id
+        return _parse_node_id(node_id)
 
+@dataclass(slots=True)
 class MockMeshtasticInterface:
-    def __init__(self):
-        self.node_manager = MockNodeManager()
-        self.sent_messages = []
-        self.message_queue = asyncio.Queue()
+    node_manager: MockNodeManager = field(default_factory=MockNodeManager)
+    sent_messages: list = field(default_factory=list)
+    message_queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=256))
 
     async def send_message(self, text, recipient):
         message_id = f"msg_{len(self.sent_messages)}"
@@ -52,14 +67,17 @@ class MockMeshtasticInterface:
         })
         return {'id': message_id}
 
+    def airtime_exceeded(self):
+        return False
+
     async def get_status(self):
         return "Mock Meshtastic Status: Connected"
 
+@dataclass(slots=True)
 class MockTelegramInterface:
-    def __init__(self):
-        self.sent_messages = []
-        self.message_queue = asyncio.Queue()
-        self.reactions = []
+    sent_messages: list = field(default_factory=list)
+    message_queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=256))
+    reactions: list = field(default_factory=list)
 
     def is_user_authorized(self, user_id):
         return True  # Mock all users as authorized for testing
@@ -97,256 +115,231 @@ def create_mock_update(text, user_id=12345, message_id=100, chat_type='group'):
     update = Update(update_id=1, message=message)
     return update
 
-async def test_chunking_mechanism():
-    """Test the chunk_message method with various inputs"""
-    print("\n=== Testing Chunking Mechanism ===")
-
-    config = MockConfig()
-    meshtastic = MockMeshtasticInterface()
-    telegram = MockTelegramInterface()
-    processor = MessageProcessor(meshtastic, telegram, config)
-
-    test_cases = [
-        # Short message
-        ("Hello world", 1),
-        # Exactly 110 chars
-        ("x" * 110, 1),
-        # Over 110 chars - should chunk
-        ("x" * 200, 2),  # 200 chars / 110 chars per chunk = 2 chunks
-        # Very long message (should be truncated to 1000 chars and chunked)
-        ("x" * 1200, 10),  # 1000 chars / ~110 chars per chunk = ~10 chunks
-        # Message with spaces (should break at word boundaries)
-        ("This is a very long message that should be split into multiple chunks for testing purposes and demonstrate word boundary breaking functionality in the chunking algorithm.",
-          2)  # Should break into 2 chunks at word boundaries
-    ]
-
-    for message, expected_chunks in test_cases:
-        chunks = processor.chunk_message(message)
-        print(f"Message length: {len(message)}, Expected chunks: {expected_chunks}, Actual chunks: {len(chunks)}")
-
-        # Verify chunk count
-        assert len(chunks) == expected_chunks, f"Expected {expected_chunks} chunks, got {len(chunks)}"
-
-        # Verify no chunk exceeds 120 chars (110 + counter length)
-        for i, chunk in enumerate(chunks):
-            assert len(chunk) <= 120, f"Chunk {i} too long: {len(chunk)} > 120"
-            print(f"  Chunk {i+1}: {chunk[:50]}{'...' if len(chunk) > 50 else ''}")
-
-        # Verify total content reconstructs properly
-        if len(chunks) > 1:
-            # Remove counters for content check
-            import re
-            content_no_counters = re.sub(r'\d+/\d+ ', '', "".join(chunks))
-            assert len(content_no_counters) <= 1000, f"Total content too long: {len(content_no_counters)} > 1000"
-
-    print("✅ Chunking mechanism tests passed!")
-
-async def test_message_formatting_and_routing():
-    """Test message formatting and routing logic"""
-    print("\n=== Testing Message Formatting and Routing ===")
-
-    config = MockConfig()
-    meshtastic = MockMeshtasticInterface()
-    telegram = MockTelegramInterface()
-    processor = MessageProcessor(meshtastic, telegram, config)
-
-    # Test DM message (should go to ^all)
-    dm_message = TelegramMessage(
-        type='telegram',
-        text='Test DM message',
-        sender='TestUser',
-        message_id=100,
-        user_id=12345,
-        chat_type='private'
-    )
-
-    # Mock asyncio.sleep to avoid delays
-    with patch('asyncio.sleep', return_value=None):
-        await processor.handle_telegram_text(dm_message)
-
-    # Check that message was sent to ^all
-    assert len(meshtastic.sent_messages) == 1
-    assert meshtastic.sent_messages[0]['recipient'] == '^all'
-    assert '[TG:TestUser] Test DM message' in meshtastic.sent_messages[0]['text']
-    print("✅ DM message routing test passed!")
-
-    # Reset for group message test
-    meshtastic.sent_messages.clear()
-
-    # Test group message (should use default node)
-    group_message = TelegramMessage(
-        type='telegram',
-        text='Test group message',
-        sender='TestUser',
-        message_id=101,
-        user_id=12345,
-        chat_type='group'
-    )
-
-    # Mock asyncio.sleep to avoid delays
-    with patch('asyncio.sleep', return_value=None):
-        await processor.handle_telegram_text(group_message)
-
-    # Check that message was sent to default node
-    assert len(meshtastic.sent_messages) == 1
-    assert meshtastic.sent_messages[0]['recipient'] == '!12345678'
-    assert '[TG:TestUser] Test group message' in meshtastic.sent_messages[0]['text']
-    print("✅ Group message routing test passed!")
-
-async def test_send_message_to_chat():
-    """Test the send_message_to_chat method"""
-    print("\n=== Testing send_message_to_chat Method ===")
-
-    config = MockConfig()
-    meshtastic = MockMeshtasticInterface()
-    telegram = MockTelegramInterface()
-    processor = MessageProcessor(meshtastic, telegram, config)
-
-    # Test sending confirmation message to user DM
-    await processor.telegram.send_message_to_chat(12345, "Test confirmation message")
-
-    assert len(telegram.sent_messages) == 1
-    assert telegram.sent_messages[0]['chat_id'] == 12345
-    assert telegram.sent_messages[0]['text'] == "Test confirmation message"
-    print("✅ send_message_to_chat test passed!")
-
-async def test_ack_handling():
-    """Test ACK handling and pending message tracking"""
-    print("\n=== Testing ACK Handling ===")
-
-    config = MockConfig()
-    meshtastic = MockMeshtasticInterface()
-    telegram = MockTelegramInterface()
-    processor = MessageProcessor(meshtastic, telegram, config)
-
-    # Send a message to create a pending ACK
-    message = TelegramMessage(
-        type='telegram',
-        text='Test message for ACK',
-        sender='TestUser',
-        message_id=102,
-        user_id=12345,
-        chat_type='group'
-    )
-
-    # Mock asyncio.sleep to avoid delays
-    with patch('asyncio.sleep', return_value=None):
-        await processor.handle_telegram_text(message)
-
-    # Check that we have a pending ACK
-    assert len(processor.pending_acks) == 1
-    message_id = list(processor.pending_acks.keys())[0]
-    assert processor.pending_acks[message_id]['telegram_message_id'] == 102
-
-    # Simulate ACK receipt
-    ack_packet = {
-        'type': 'ack',
-        'fromId': '!87654321',
-        'toId': '!12345678',
-        'message_id': message_id
-    }
-
-    await processor.handle_ack(ack_packet)
-
-    # Check that ACK was processed and pending ACK removed
-    assert len(processor.pending_acks) == 0
-    assert len(telegram.reactions) == 1
-    assert telegram.reactions[0]['message_id'] == 102
-    assert telegram.reactions[0]['emoji'] == '✅'
-    print("✅ ACK handling test passed!")
-
-async def test_chunked_message_ack():
-    """Test ACK handling for chunked messages"""
-    print("\n=== Testing Chunked Message ACK ===")
-
-    config = MockConfig()
-    meshtastic = MockMeshtasticInterface()
-    telegram = MockTelegramInterface()
-    processor = MessageProcessor(meshtastic, telegram, config)
-
-    # Send a long message that will be chunked
-    long_message = "x" * 200  # This creates 3 chunks due to word boundary breaking with the prefix
-    message = TelegramMessage(
-        type='telegram',
-        text=long_message,
-        sender='TestUser',
-        message_id=103,
-        user_id=12345,
-        chat_type='group'
-    )
-
-    # Mock asyncio.sleep to avoid 5-second delays between chunks
-    with patch('asyncio.sleep', return_value=None):
-        await processor.handle_telegram_text(message)
-
-    # Check that we have 3 pending ACKs (one per chunk)
-    assert len(processor.pending_acks) == 3
-    message_ids = list(processor.pending_acks.keys())
-
-    # Simulate ACK for first chunk
-    ack_packet1 = {
-        'type': 'ack',
-        'fromId': '!87654321',
-        'toId': '!12345678',
-        'message_id': message_ids[0]
-    }
-
-    await processor.handle_ack(ack_packet1)
-
-    # Should still have 2 pending ACKs and 1 reaction (ACK processed for first chunk)
-    assert len(processor.pending_acks) == 2
-    assert len(telegram.reactions) == 1
-
-    # Simulate ACK for second chunk
-    ack_packet2 = {
-        'type': 'ack',
-        'fromId': '!87654321',
-        'toId': '!12345678',
-        'message_id': message_ids[1]
-    }
-
-    await processor.handle_ack(ack_packet2)
-
-    # Should still have 1 pending ACK and 2 reactions
-    assert len(processor.pending_acks) == 1
-    assert len(telegram.reactions) == 2
-
-    # Simulate ACK for third chunk
-    ack_packet3 = {
-        'type': 'ack',
-        'fromId': '!87654321',
-        'toId': '!12345678',
-        'message_id': message_ids[2]
-    }
-
-    await processor.handle_ack(ack_packet3)
-
-    # All ACKs should be processed
-    assert len(processor.pending_acks) == 0
-    assert len(telegram.reactions) == 3  # One reaction per chunk
-    print("✅ Chunked message ACK test passed!")
-
-async def main():
-    """Run all tests"""
-    print("Starting comprehensive message sending integration tests...")
-
-    try:
-        await test_chunking_mechanism()
-        await test_message_formatting_and_routing()
-        await test_send_message_to_chat()
-        await test_ack_handling()
-        await test_chunked_message_ack()
-
-        print("\n🎉 All tests passed successfully!")
-
-    except Exception as e:
-        print(f"\n❌ Test failed: {e}")
-        import traceback
-        traceback.print_exc()
-        return 1
-
-    return 0
+# (message, expected chunk count)
+CHUNKING_CASES = (
+    # Short message
+    ("Hello world", 1),
+    # Exactly 110 chars
+    ("x" * 110, 1),
+    # Over 110 chars - should chunk
+    ("x" * 200, 2),  # 200 chars / 110 chars per chunk = 2 chunks
+    # Very long message (should be truncated to 1000 chars and chunked)
+    ("x" * 1200, 10),  # 1000 chars / ~110 chars per chunk = ~10 chunks
+    # Message with spaces (should break at word boundaries)
+    ("This is a very long message that should be split into multiple chunks for testing purposes and demonstrate word boundary breaking functionality in the chunking algorithm.",
+     2),  # Should break into 2 chunks at word boundaries
+)
+
+class TestMessageSendingIntegration(unittest.IsolatedAsyncioTestCase):
+    """Message sending tests for the meshgram MessageProcessor against mock interfaces."""
+
+    @classmethod
+    def setUpClass(cls):
+        # The mock graph is built once and reset between tests
+        cls.config = MockConfig()
+        cls.meshtastic = MockMeshtasticInterface()
+        cls.telegram = MockTelegramInterface()
+        cls.processor = MessageProcessor(cls.meshtastic, cls.telegram, cls.config)
+
+        # No test wants to wait between chunks. asyncio.sleep itself stays real so
+        # remove_pending_ack keeps its ack_timeout and pending_acks only changes on ACKs
+        cls.processor.chunk_spacing = 0
+
+    async def asyncSetUp(self):
+        self._reset()
+
+    def _reset(self):
+        """Clear everything a previous test may have recorded on the shared mocks."""
+        self.meshtastic.sent_messages.clear()
+        self.telegram.sent_messages.clear()
+        self.telegram.reactions.clear()
+        self.processor.pending_acks.clear()
+
+    async def test_chunking_mechanism(self):
+        """Test the chunk_message method with various inputs"""
+        for message, expected_chunks in CHUNKING_CASES:
+            with self.subTest(length=len(message)):
+                chunks = self.processor.chunk_message(message)
+
+                # Verify chunk count
+                self.assertEqual(len(chunks), expected_chunks)
+
+                # Verify no chunk exceeds 120 chars (110 + counter length)
+                for chunk in chunks:
+                    self.assertLessEqual(len(chunk), 120)
+
+                # Verify total content reconstructs properly
+                if len(chunks) > 1:
+                    # Measure content without counters, no joined copy of the chunks is built
+                    total = sum(len(chunk) for chunk in chunks)
+                    counters = sum(match.end() for match in map(_COUNTER_RE.match, chunks) if match)
+                    self.assertLessEqual(total - counters, 1000)
+
+    @unittest.skipUnless(os.environ.get("RUN_PERF_TESTS"), "set RUN_PERF_TESTS=1 to run timing tests")
+    async def test_chunking_large_text_scales_linearly(self):
+        """Guard against chunk_message going quadratic in the input size"""
+        def time_chunking(text, repeat=50):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                self.processor.chunk_message(text)
+            return time.perf_counter() - start
+
+        small = time_chunking("word " * 20_000)   # 100 KB
+        large = time_chunking("word " * 200_000)  # 1 MB
+        # 10x the input may cost at most ~15x the time
+        self.assertLess(large / small, 15)
+
+    async def test_message_formatting_and_routing(self):
+        """Test message formatting and routing logic"""
+        # Test DM message (should go to ^all)
+        dm_message = TelegramMessage(
+            type='telegram',
+            text='Test DM message',
+            sender='TestUser',
+            message_id=100,
+            user_id=12345,
+            chat_type='private'
+        )
+
+        await self.processor.handle_telegram_text(dm_message)
+
+        # Check that message was sent to ^all
+        self.assertEqual(len(self.meshtastic.sent_messages), 1)
+        self.assertEqual(self.meshtastic.sent_messages[0]['recipient'], '^all')
+        self.assertIn('[TG:TestUser] Test DM message', self.meshtastic.sent_messages[0]['text'])
+
+        # Reset for group message test
+        self.meshtastic.sent_messages.clear()
+
+        # Test group message (should use default node)
+        group_message = TelegramMessage(
+            type='telegram',
+            text='Test group message',
+            sender='TestUser',
+            message_id=101,
+            user_id=12345,
+            chat_type='group'
+        )
+
+        await self.processor.handle_telegram_text(group_message)
+
+        # Check that message was sent to default node
+        self.assertEqual(len(self.meshtastic.sent_messages), 1)
+        self.assertEqual(self.meshtastic.sent_messages[0]['recipient'], '!12345678')
+        self.assertIn('[TG:TestUser] Test group message', self.meshtastic.sent_messages[0]['text'])
+
+    async def test_send_message_to_chat(self):
+        """Test the send_message_to_chat method"""
+        # Test sending confirmation message to user DM
+        await self.processor.telegram.send_message_to_chat(12345, "Test confirmation message")
+
+        self.assertEqual(len(self.telegram.sent_messages), 1)
+        self.assertEqual(self.telegram.sent_messages[0]['chat_id'], 12345)
+        self.assertEqual(self.telegram.sent_messages[0]['text'], "Test confirmation message")
+
+    async def test_ack_handling(self):
+        """Test ACK handling and pending message tracking"""
+        # Send a message to create a pending ACK
+        message = TelegramMessage(
+            type='telegram',
+            text='Test message for ACK',
+            sender='TestUser',
+            message_id=102,
+            user_id=12345,
+            chat_type='group'
+        )
+
+        await self.processor.handle_telegram_text(message)
+
+        # Check that we have a pending ACK
+        self.assertEqual(len(self.processor.pending_acks), 1)
+        message_id = next(iter(self.processor.pending_acks))
+        self.assertEqual(self.processor.pending_acks[message_id]['telegram_message_id'], 102)
+
+        # Simulate ACK receipt
+        ack_packet = {
+            'type': 'ack',
+            'fromId': '!87654321',
+            'toId': '!12345678',
+            'message_id': message_id
+        }
+
+        await self.processor.handle_ack(ack_packet)
+
+        # Check that ACK was processed and pending ACK removed
+        self.assertEqual(len(self.processor.pending_acks), 0)
+        self.assertEqual(len(self.telegram.reactions), 1)
+        self.assertEqual(self.telegram.reactions[0]['message_id'], 102)
+        self.assertEqual(self.telegram.reactions[0]['emoji'], '✅')
+
+    async def test_chunked_message_ack(self):
+        """Test ACK handling for chunked messages"""
+        # Send a long message that will be chunked
+        long_message = "x" * 200  # This creates 3 chunks due to word boundary breaking with the prefix
+        message = TelegramMessage(
+            type='telegram',
+            text=long_message,
+            sender='TestUser',
+            message_id=103,
+            user_id=12345,
+            chat_type='group'
+        )
+
+        await self.processor.handle_telegram_text(message)
+        # Let the remove_pending_ack tasks start, they must not expire before ack_timeout
+        await asyncio.sleep(0)
+
+        # Check that we have 3 pending ACKs (one per chunk)
+        self.assertEqual(len(self.processor.pending_acks), 3)
+        # Snapshot the ids, pending_acks shrinks as each ACK is handled below
+        message_ids = tuple(self.processor.pending_acks)
+
+        # ACK each chunk in turn, one reaction is added per chunk
+        for acked, message_id in enumerate(message_ids, start=1):
+            ack_packet = {
+                'type': 'ack',
+                'fromId': '!87654321',
+                'toId': '!12345678',
+                'message_id': message_id
+            }
+
+            await self.processor.handle_ack(ack_packet)
+
+            self.assertEqual(len(self.processor.pending_acks), 3 - acked)
+            self.assertEqual(len(self.telegram.reactions), acked)
+
+    async def test_chunk_ack_before_next_chunk_sent(self):
+        """Test that a chunk's ACK is matched while later chunks are still being sent"""
+        message = TelegramMessage(
+            type='telegram',
+            text="x" * 200,  # 3 chunks, as in test_chunked_message_ack
+            sender='TestUser',
+            message_id=104,
+            user_id=12345,
+            chat_type='group'
+        )
+
+        send_message = MockMeshtasticInterface.send_message
+
+        async def ack_previous_then_send(meshtastic, text, recipient):
+            # The ACK for the previous chunk arrives before this chunk goes out
+            if meshtastic.sent_messages:
+                await self.processor.handle_ack({
+                    'type': 'ack',
+                    'fromId': '!87654321',
+                    'toId': '!12345678',
+                    'message_id': meshtastic.sent_messages[-1]['id']
+                })
+            return await send_message(meshtastic, text, recipient)
+
+        with patch.object(MockMeshtasticInterface, 'send_message', new=ack_previous_then_send):
+            await self.processor.handle_telegram_text(message)
+
+        # Chunks 1 and 2 were ACKed mid-send, only the last one is still pending
+        self.assertEqual(len(self.meshtastic.sent_messages), 3)
+        self.assertEqual(list(self.processor.pending_acks), [self.meshtastic.sent_messages[-1]['id']])
+        self.assertEqual(len(self.telegram.reactions), 2)
+        self.assertTrue(all(reaction['message_id'] == 104 for reaction in self.telegram.reactions))
 
 if __name__ == "__main__":
-    exit_code = asyncio.run(main())
-    sys.exit(exit_code)
\ No newline at end of file
+    unittest.main()
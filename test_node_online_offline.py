@@ -16,53 +16,42 @@ import time
 import sqlite3
 import os
 import sys
-import tempfile
-import shutil
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 
 # Add the project root to the path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from webui.db_handler import (
-    get_db_connection, add_node, update_node_last_seen, update_node_telemetry,
-    check_and_update_offline_nodes, get_nodes, update_node, set_setting
+    add_node, update_node_last_seen, update_node_telemetry,
+    check_and_update_offline_nodes, get_node_by_id, update_node
+)
+from webui.cache import get_cache_manager
+
+# Every test runs on a frozen clock starting here (2024-01-01 12:00:00 UTC)
+FROZEN_NOW = 1704110400.0
+
+# (packet type, node id, how receiving it updates the node, expected node fields)
+ONLINE_PACKET_CASES = (
+    ('TEXT_MESSAGE_APP', "1234567890", update_node_last_seen, {}),
+    ('ROUTING_APP', "1234567891", update_node_last_seen, {}),
+    ('POSITION_APP', "1234567892",
+     lambda node_id: update_node(node_id, latitude=37.7749, longitude=-122.4194, last_activity=time.time(), is_online=True),
+     {'latitude': 37.7749, 'longitude': -122.4194}),
+    ('TELEMETRY_APP', "1234567893", lambda node_id: update_node_telemetry(node_id, battery_level=85), {'battery_level': 85}),
+    ('NODEINFO_APP', "1234567894", update_node_last_seen, {}),
+    ('NEIGHBORINFO_APP', "1234567895", update_node_last_seen, {}),
+    ('TRACEROUTE_APP', "1234567896", update_node_last_seen, {}),
 )
 
 
 class TestNodeOnlineOffline(unittest.TestCase):
     """Test cases for node online/offline status handling."""
 
-    def setUp(self):
-        """Set up test database."""
-        # Create a temporary database for testing
-        self.test_db_path = tempfile.mktemp(suffix='.db')
-        self.original_get_db_connection = get_db_connection
-
-        # Patch get_db_connection to use our test database
-        def test_get_db_connection(db_name='dashboard.db'):
-            db_path = os.path.join(os.path.dirname(self.test_db_path), db_name)
-            if db_name == 'dashboard.db':
-                db_path = self.test_db_path
-            conn = sqlite3.connect(db_path)
-            conn.execute("PRAGMA foreign_keys = ON")
-            conn.execute("PRAGMA journal_mode = WAL")
-            return conn
-
-        # Monkey patch the function
-        import webui.db_handler
-        webui.db_handler.get_db_connection = test_get_db_connection
-
-        # Initialize the database schema manually for testing
-        # Use the actual database file directly
-        conn = sqlite3.connect(self.test_db_path)
-        cursor = conn.cursor()
-
-        # Enable WAL mode
-        cursor.execute('PRAGMA journal_mode=WAL;')
-
-        # Drop tables if they exist
-        cursor.execute('DROP TABLE IF EXISTS nodes')
-        cursor.execute('DROP TABLE IF EXISTS settings')
+    @classmethod
+    def setUpClass(cls):
+        """Build the schema once into an in-memory template database."""
+        cls._template = sqlite3.connect(':memory:')
+        cursor = cls._template.cursor()
 
         # Create nodes table
         cursor.execute('''
@@ -100,271 +89,158 @@ class TestNodeOnlineOffline(unittest.TestCase):
         )
         ''')
 
-        conn.commit()
-        print(f"Database initialized at: {self.test_db_path}")
-        conn.close()
+        # Index the offline sweep runs on, as created by init_db
+        cursor.execute('CREATE INDEX idx_nodes_online_activity ON nodes(is_online, last_activity)')
 
-        # Insert default settings if not exist
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("INSERT OR IGNORE INTO settings (key, value, description) VALUES (?, ?, ?)",
+        # Insert default settings
+        cursor.execute("INSERT INTO settings (key, value, description) VALUES (?, ?, ?)",
                       ('node.inactivity_timeout_minutes', '30', 'Timeout in minutes for node offline detection'))
-        conn.commit()
-        conn.close()
 
-    def tearDown(self):
-        """Clean up test database."""
-        # Restore original function
-        import webui.db_handler
-        webui.db_handler.get_db_connection = self.original_get_db_connection
-
-        # Remove test database
-        if os.path.exists(self.test_db_path):
-            os.unlink(self.test_db_path)
+        # Seed every node the tests use in one batch: offline nodes last heard
+        # an hour ago, plus one node that is online now
+        now = FROZEN_NOW
+        hour_ago = now - 3600
+        rows = [(node_id, "Test Node", hour_ago, hour_ago, 0) for _, node_id, _, _ in ONLINE_PACKET_CASES]
+        rows.append(("1234567897", "Test Node", now, now, 1))
+        rows.append(("1234567898", "Test Node", hour_ago, hour_ago, 0))
+        cursor.executemany("INSERT INTO nodes (node_id, name, last_seen, last_activity, is_online) VALUES (?, ?, ?, ?, ?)", rows)
+        cls._template.commit()
 
-    def test_node_marked_online_on_text_message(self):
-        """Test that nodes are marked online when receiving TEXT_MESSAGE_APP packets."""
-        node_id = "1234567890"
-
-        # Add a node that's initially offline
-        add_node(node_id, "Test Node", time.time() - 3600, None, None, None, None)  # 1 hour ago
-        update_node(node_id, is_online=False)
-
-        # Verify node is offline
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
-        self.assertIsNotNone(node)
-        self.assertEqual(node['is_online'], 0)
+    @classmethod
+    def tearDownClass(cls):
+        cls._template.close()
 
-        # Simulate receiving a TEXT_MESSAGE_APP packet by calling update_node_last_seen
-        update_node_last_seen(node_id)
-
-        # Verify node is now online - force cache invalidation
-        from webui.cache import get_cache_manager
-        cache = get_cache_manager()
-        cache.delete(cache.get_nodes_cache_key())
-
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
-        self.assertEqual(node['is_online'], 1)
-        self.assertGreater(node['last_activity'], time.time() - 10)  # Within last 10 seconds
-
-    def test_node_marked_online_on_routing_app(self):
-        """Test that nodes are marked online when receiving ROUTING_APP packets."""
-        node_id = "1234567891"
-
-        # Add a node that's initially offline
-        add_node(node_id, "Test Node", time.time() - 3600, None, None, None, None)
-        update_node(node_id, is_online=False)
-
-        # Verify node is offline
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
-        self.assertEqual(node['is_online'], 0)
-
-        # Simulate receiving a ROUTING_APP packet
-        update_node_last_seen(node_id)
-
-        # Verify node is now online - force cache invalidation
-        from webui.cache import get_cache_manager
-        cache = get_cache_manager()
-        cache.delete(cache.get_nodes_cache_key())
-
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
-        self.assertEqual(node['is_online'], 1)
-
-    def test_node_marked_online_on_position_app(self):
-        """Test that nodes are marked online when receiving POSITION_APP packets."""
-        node_id = "1234567892"
-
-        # Add a node that's initially offline
-        add_node(node_id, "Test Node", time.time() - 3600, None, None, None, None)
-        update_node(node_id, is_online=False)
-
-        # Verify node is offline
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
-        self.assertEqual(node['is_online'], 0)
-
-        # Simulate receiving a POSITION_APP packet by updating position data
-        update_node(node_id, latitude=37.7749, longitude=-122.4194, last_activity=time.time(), is_online=True)
-
-        # Verify node is now online
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
-        self.assertEqual(node['is_online'], 1)
-
-    def test_node_marked_online_on_telemetry_app(self):
-        """Test that nodes are marked online when receiving TELEMETRY_APP packets."""
-        node_id = "1234567893"
-
-        # Add a node that's initially offline
-        add_node(node_id, "Test Node", time.time() - 3600, None, None, None, None)
-        update_node(node_id, is_online=False)
-
-        # Verify node is offline
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
-        self.assertEqual(node['is_online'], 0)
-
-        # Simulate receiving a TELEMETRY_APP packet
-        update_node_telemetry(node_id, battery_level=85)
-
-        # Verify node is now online
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
-        self.assertEqual(node['is_online'], 1)
-        self.assertEqual(node['battery_level'], 85)
-
-    def test_node_marked_online_on_nodeinfo_app(self):
-        """Test that nodes are marked online when receiving NODEINFO_APP packets."""
-        node_id = "1234567894"
-
-        # Add a node that's initially offline
-        add_node(node_id, "Test Node", time.time() - 3600, None, None, None, None)
-        update_node(node_id, is_online=False)
-
-        # Verify node is offline
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
-        self.assertEqual(node['is_online'], 0)
-
-        # Simulate receiving a NODEINFO_APP packet
-        update_node_last_seen(node_id)
-
-        # Verify node is now online - force cache invalidation
-        from webui.cache import get_cache_manager
-        cache = get_cache_manager()
-        cache.delete(cache.get_nodes_cache_key())
-
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
-        self.assertEqual(node['is_online'], 1)
-
-    def test_node_marked_online_on_neighborinfo_app(self):
-        """Test that nodes are marked online when receiving NEIGHBORINFO_APP packets."""
-        node_id = "1234567895"
-
-        # Add a node that's initially offline
-        add_node(node_id, "Test Node", time.time() - 3600, None, None, None, None)
-        update_node(node_id, is_online=False)
-
-        # Verify node is offline
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
-        self.assertEqual(node['is_online'], 0)
+    def setUp(self):
+        """Set up test database."""
+        # Copy the template into a fresh in-memory database for this test
+        self.conn = sqlite3.connect(':memory:')
+        self._template.backup(self.conn)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute("PRAGMA journal_mode = MEMORY")
 
-        # Simulate receiving a NEIGHBORINFO_APP packet
-        update_node_last_seen(node_id)
+        # An in-memory database only lives as long as its connection, so hand
+        # out the same connection and ignore the close() db_handler calls on it
+        class SharedConnection:
+            def __init__(self, real_conn):
+                self.real_conn = real_conn
 
-        # Verify node is now online - force cache invalidation
-        from webui.cache import get_cache_manager
-        cache = get_cache_manager()
-        cache.delete(cache.get_nodes_cache_key())
+            def close(self):
+                pass
 
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
-        self.assertEqual(node['is_online'], 1)
+            def __getattr__(self, name):
+                return getattr(self.real_conn, name)
 
-    def test_node_marked_online_on_traceroute_app(self):
-        """Test that nodes are marked online when receiving TRACEROUTE_APP packets."""
-        node_id = "1234567896"
+        shared_conn = SharedConnection(self.conn)
 
-        # Add a node that's initially offline
-        add_node(node_id, "Test Node", time.time() - 3600, None, None, None, None)
-        update_node(node_id, is_online=False)
-
-        # Verify node is offline
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
-        self.assertEqual(node['is_online'], 0)
+        # Patch get_db_connection to use our test database
+        import webui.db_handler
+        self.original_get_db_connection = webui.db_handler.get_db_connection
+        webui.db_handler.get_db_connection = lambda db_name='dashboard.db': shared_conn
 
-        # Simulate receiving a TRACEROUTE_APP packet
-        update_node_last_seen(node_id)
+        # Nodes cached from a previous test's database must not leak into this one
+        self._refresh_nodes()
 
-        # Verify node is now online - force cache invalidation
-        from webui.cache import get_cache_manager
-        cache = get_cache_manager()
-        cache.delete(cache.get_nodes_cache_key())
+        # Freeze the clock; tests move it forward explicitly with _tick()
+        self.now = FROZEN_NOW
+        clock_patcher = patch('time.time', side_effect=lambda: self.now)
+        clock_patcher.start()
+        self.addCleanup(clock_patcher.stop)
 
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
-        self.assertEqual(node['is_online'], 1)
+    def tearDown(self):
+        """Clean up test database."""
+        # Restore original function
+        import webui.db_handler
+        webui.db_handler.get_db_connection = self.original_get_db_connection
+        self.conn.close()
+
+    def _refresh_nodes(self):
+        """Drop the cached node list so the next get_nodes() reads the test database."""
+        get_cache_manager().invalidate_nodes()
+
+    def _tick(self, minutes=0, seconds=0):
+        """Advance the frozen clock."""
+        self.now += minutes * 60 + seconds
+
+    def _node(self, node_id):
+        """Fetch a single node row by id, filtered in SQLite rather than by scanning get_nodes()."""
+        return get_node_by_id(node_id)
+
+    def test_node_marked_online_on_packet(self):
+        """Test that nodes are marked online when receiving any relevant packet type."""
+        for app, node_id, trigger, expected in ONLINE_PACKET_CASES:
+            with self.subTest(app=app):
+                # Verify the seeded node is offline
+                node = self._node(node_id)
+                self.assertIsNotNone(node)
+                self.assertEqual(node['is_online'], 0)
+
+                # Simulate receiving the packet
+                trigger(node_id)
+
+                # Verify node is now online
+                node = self._node(node_id)
+                self.assertEqual(node['is_online'], 1)
+                self.assertEqual(node['last_activity'], self.now)
+                for field, value in expected.items():
+                    self.assertEqual(node[field], value)
 
     def test_offline_detection_after_30_minutes(self):
         """Test that nodes are marked offline only after exactly 30 minutes of no activity."""
         node_id = "1234567897"
 
-        # Add a node that's online
-        add_node(node_id, "Test Node", time.time(), None, None, None, None)
-        update_node(node_id, is_online=True, last_activity=time.time())
-
-        # Verify node is online
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
+        # Verify the seeded node is online
+        node = self._node(node_id)
         self.assertEqual(node['is_online'], 1)
 
-        # Set last_activity to 29 minutes ago (should still be online)
-        twenty_nine_minutes_ago = time.time() - (29 * 60)
-        update_node(node_id, last_activity=twenty_nine_minutes_ago)
+        # 29 minutes without activity (should still be online)
+        self._tick(minutes=29)
 
         # Run offline check
         check_and_update_offline_nodes()
 
         # Verify node is still online
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
+        node = self._node(node_id)
         self.assertEqual(node['is_online'], 1)
 
-        # Set last_activity to 31 minutes ago (should be offline)
-        thirty_one_minutes_ago = time.time() - (31 * 60)
-        update_node(node_id, last_activity=thirty_one_minutes_ago)
+        # 31 minutes without activity (should be offline)
+        self._tick(minutes=2)
 
         # Run offline check
         check_and_update_offline_nodes()
 
         # Verify node is now offline
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
+        node = self._node(node_id)
         self.assertEqual(node['is_online'], 0)
 
     def test_offline_logic_considers_all_packet_types(self):
         """Test that offline detection considers activity from all relevant packet types."""
         node_id = "1234567898"
 
-        # Add a node
-        add_node(node_id, "Test Node", time.time() - 3600, None, None, None, None)
-
-        # Simulate various packet types updating last_activity
-        current_time = time.time()
-
         # TEXT_MESSAGE_APP activity
-        update_node(node_id, last_activity=current_time - 1800, is_online=True)  # 30 min ago
+        update_node(node_id, last_activity=self.now, is_online=True)
 
-        # Run offline check - should be offline since 30 min ago
+        # Just over 30 minutes later the offline check should set it offline
+        self._tick(minutes=30, seconds=1)
         check_and_update_offline_nodes()
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
+        node = self._node(node_id)
         self.assertEqual(node['is_online'], 0)
 
         # Simulate TELEMETRY_APP activity (brings back online)
         update_node_telemetry(node_id, battery_level=90)  # This updates last_activity
 
         # Verify back online
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
+        node = self._node(node_id)
         self.assertEqual(node['is_online'], 1)
 
-        # Set last_activity to 31 minutes ago
-        update_node(node_id, last_activity=current_time - 1860)  # 31 min ago
+        # 31 minutes without activity
+        self._tick(minutes=31)
 
         # Run offline check
         check_and_update_offline_nodes()
 
         # Verify offline
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
+        node = self._node(node_id)
         self.assertEqual(node['is_online'], 0)
 
     def test_existing_functionality_not_broken(self):
@@ -372,24 +248,21 @@ class TestNodeOnlineOffline(unittest.TestCase):
         node_id = "1234567899"
 
         # Test add_node
-        add_node(node_id, "Test Node", time.time(), 80, 37.7749, -122.4194, 100)
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
+        add_node(node_id, "Test Node", self.now, 80, 37.7749, -122.4194, 100)
+        node = self._node(node_id)
         self.assertIsNotNone(node)
         self.assertEqual(node['name'], "Test Node")
         self.assertEqual(node['battery_level'], 80)
 
         # Test update_node
         update_node(node_id, name="Updated Node", battery_level=85)
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
+        node = self._node(node_id)
         self.assertEqual(node['name'], "Updated Node")
         self.assertEqual(node['battery_level'], 85)
 
         # Test update_node_telemetry
         update_node_telemetry(node_id, snr=15.5, rssi=-50)
-        nodes = get_nodes()
-        node = next((n for n in nodes if n['node_id'] == node_id), None)
+        node = self._node(node_id)
         self.assertEqual(node['snr'], 15.5)
         self.assertEqual(node['rssi'], -50)
 
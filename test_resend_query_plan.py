@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Query plan checks for the message resend lookup.
+
+Builds the real init_db() schema in an in-memory database and verifies that
+the resend query used by resend_undelivered_messages is answered through
+idx_messages_node_status instead of a scan of the messages table.
+"""
+
+import unittest
+import sqlite3
+import os
+import sys
+import time
+from unittest.mock import patch
+
+# Add the project root to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import webui.database
+from webui.db_handler import RESEND_MESSAGES_SQL
+
+
+class TestResendQueryPlan(unittest.TestCase):
+    """Query plan tests for the resend lookup."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Run init_db() against an in-memory database."""
+        cls.conn = sqlite3.connect(':memory:')
+
+        # init_db() closes its connection when done; keep ours open for the tests
+        class SharedConnection:
+            def __init__(self, real_conn):
+                self.real_conn = real_conn
+
+            def close(self):
+                pass
+
+            def __getattr__(self, name):
+                return getattr(self.real_conn, name)
+
+        with patch('webui.database.sqlite3.connect', return_value=SharedConnection(cls.conn)):
+            webui.database.init_db()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+
+    def test_resend_query_uses_index(self):
+        """Test that both branches of the resend lookup search idx_messages_node_status."""
+        now = time.time()
+        rows = self.conn.execute(
+            "EXPLAIN QUERY PLAN " + RESEND_MESSAGES_SQL, ('12345678', now - 30, now)
+        ).fetchall()
+        details = [row[3] for row in rows]
+
+        searches = [detail for detail in details if detail.startswith('SEARCH messages')]
+        self.assertEqual(len(searches), 2, details)
+        for detail in searches:
+            self.assertIn('USING INDEX idx_messages_node_status', detail)
+        self.assertFalse(any(detail.startswith('SCAN messages') for detail in details), details)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
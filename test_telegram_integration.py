@@ -4,26 +4,45 @@ Test script for Telegram bot integration functionality.
 Tests the integration without requiring actual hardware or external services.
 """
 
-import asyncio
+import functools
+import importlib
 import sys
 import os
+import re
 import unittest
-from unittest.mock import Mock, patch, MagicMock
-import tempfile
+from unittest.mock import AsyncMock, Mock, patch, MagicMock
 import configparser
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-
-# Add the project root to Python path
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-
-class TestTelegramIntegration(unittest.TestCase):
-    """Test cases for Telegram bot integration."""
-
-    def setUp(self):
-        """Set up test fixtures."""
-        # Create a temporary config file for testing
-        self.temp_config = tempfile.NamedTemporaryFile(mode='w', suffix='.ini', delete=False)
-        self.temp_config.write("""
+from types import MappingProxyType
+from typing import Any, Dict, Tuple
+
+from modules.meshgram_integration.config_manager import ConfigManager
+
+INTEGRATION_MODULES = (
+    'modules.meshgram_integration.config_manager',
+    'modules.meshgram_integration.meshgram',
+    'modules.meshgram_integration.telegram_interface',
+    'modules.meshgram_integration.message_processor',
+    'modules.meshgram_integration.meshtastic_interface',
+    'modules.meshgram_integration.node_manager',
+)
+
+# The remaining modules pull in the Telegram and Meshtastic client libraries;
+# tests that need them are skipped when those are not installed.
+try:
+    from modules.meshgram_integration.meshgram import MeshgramIntegration
+    from modules.meshgram_integration.telegram_interface import TelegramInterface
+    from modules.meshgram_integration.message_processor import MessageProcessor
+    from modules.meshgram_integration.meshtastic_interface import MeshtasticInterface
+    from modules.meshgram_integration.node_manager import NodeManager
+    _IMPORT_ERROR = None
+except ImportError as e:
+    _IMPORT_ERROR = e
+
+requires_integration = unittest.skipIf(_IMPORT_ERROR is not None, f"integration modules unavailable: {_IMPORT_ERROR}")
+
+_CONFIG_INI = """
 [interface]
 type = tcp
 hostname = 192.168.1.245
@@ -37,67 +56,135 @@ meshtastic_default_node_id = !4e1a832c
 [general]
 respond_by_dm_only = True
 defaultChannel = 3
-""")
-        self.temp_config.close()
+"""
+
+@functools.lru_cache(maxsize=None)
+def _spec_attrs(cls: type) -> Tuple[str, ...]:
+    """Attribute names of cls, introspected once per class."""
+    return tuple(name for name in dir(cls) if not name.startswith('__'))
+
+def spec_mock(cls: type, *extra_attrs: str, **kwargs: Any) -> Mock:
+    """Build a Mock restricted to the attributes of cls plus any extra instance attributes."""
+    return Mock(spec_set=_spec_attrs(cls) + extra_attrs, **kwargs)
+
+# Per-test progress lines are only printed when TEST_VERBOSE is set
+VERBOSE = bool(os.environ.get('TEST_VERBOSE'))
+
+def _progress(message: str) -> None:
+    if VERBOSE:
+        print(message)
+
+_SECTION_RE = re.compile(r'\n\[([^\]]+)\]\n')
+_OPTION_RE = re.compile(r'(\w[\w.]*)\s*=\s*(.*)')
 
-        # Mock the config file path
-        self.original_config = None
+def _fast_parse(text: str) -> Dict[str, Dict[str, str]]:
+    """Parse a flat INI of [section] headers and key = value lines into nested dicts."""
+    parts = _SECTION_RE.split('\n' + text)
+    return {name: dict(_OPTION_RE.findall(body)) for name, body in zip(parts[1::2], parts[2::2])}
 
-    def tearDown(self):
-        """Clean up test fixtures."""
-        if os.path.exists(self.temp_config.name):
-            os.unlink(self.temp_config.name)
+# Parsed once at import; the tests only read from it
+_CONFIG = configparser.ConfigParser()
+_CONFIG.read_string(_CONFIG_INI)
+
+class TestTelegramIntegration(unittest.IsolatedAsyncioTestCase):
+    """Test cases for Telegram bot integration."""
+
+    # Telegram settings served by mocked ConfigManager.get
+    _CFG_MAP = MappingProxyType({
+        'telegram.telegram_bot_token': '123456789:ABCdefGHIjklMNOpqrsTUVwxyz',
+        'telegram.telegram_chat_id': -1001234567890,
+        'telegram.telegram_authorized_users': '123456789,987654321'
+    })
+
+    # Tests that share the class-level mocks or patch module globals; run_tests() never overlaps them
+    SERIAL_TESTS = frozenset({
+        'test_config_manager_functionality',
+        'test_telegram_interface_commands',
+        'test_message_processor_commands',
+        'test_command_handler_logic',
+        'test_integration_initialization',
+    })
+
+    # Telegram commands and the fields each definition must carry
+    EXPECTED_COMMANDS = frozenset({'start', 'help', 'status', 'bell', 'node', 'user'})
+    COMMAND_FIELDS = frozenset({'description', 'handler'})
+
+    # Markers that must appear in mesh_bot.py and packages that must be in requirements.txt
+    MESH_BOT_MARKERS = frozenset({'create_meshgram_integration', 'telegram_bot_token', 'telegram_integration'})
+    REQUIRED_PACKAGES = frozenset({'meshtastic', 'python-telegram-bot', 'envyaml'})
+
+    @classmethod
+    def setUpClass(cls):
+        """Read the project files checked by the source tests once."""
+        with open('mesh_bot.py', 'r') as f:
+            cls._mesh_bot_src = f.read()
+        with open('requirements.txt', 'r') as f:
+            cls._requirements_src = f.read()
+
+        # One alternation per file so each is scanned in a single pass
+        cls._mesh_bot_pat = re.compile('|'.join(map(re.escape, sorted(cls.MESH_BOT_MARKERS))))
+        cls._req_pat = re.compile('|'.join(map(re.escape, sorted(cls.REQUIRED_PACKAGES))))
+
+        # Spec'd mocks introspect their target class, so build them once and reset per test
+        if _IMPORT_ERROR is None:
+            cls._mock_config = spec_mock(ConfigManager)
+            cls._mock_telegram = spec_mock(TelegramInterface)
+            # node_manager is an instance attribute, so it is not in the class listing
+            cls._mock_meshtastic = spec_mock(MeshtasticInterface, 'node_manager')
+            cls._mock_node_manager = spec_mock(NodeManager)
+            cls._mock_meshtastic.node_manager = cls._mock_node_manager
+            cls._shared_mocks = (cls._mock_config, cls._mock_telegram, cls._mock_meshtastic, cls._mock_node_manager)
+        else:
+            cls._shared_mocks = ()
+
+    def setUp(self):
+        """Clear calls and per-test overrides left on the shared mocks."""
+        for mock in self._shared_mocks:
+            mock.reset_mock(return_value=True, side_effect=True)
 
     def test_config_loading(self):
         """Test that configuration loads correctly."""
-        print("Testing configuration loading...")
+        _progress("Testing configuration loading...")
 
-        # Test config file parsing
-        config = configparser.ConfigParser()
-        config.read(self.temp_config.name)
+        # Test config parsing
+        config = _fast_parse(_CONFIG_INI)
 
         # Verify telegram section exists
-        self.assertIn('telegram', config.sections())
-        self.assertEqual(config.get('telegram', 'telegram_bot_token'), '123456789:ABCdefGHIjklMNOpqrsTUVwxyz')
-        self.assertEqual(config.get('telegram', 'telegram_chat_id'), '-1001234567890')
-        self.assertEqual(config.get('telegram', 'telegram_authorized_users'), '123456789,987654321')
+        self.assertIn('telegram', config)
+        telegram = config['telegram']
+        self.assertEqual(telegram['telegram_bot_token'], '123456789:ABCdefGHIjklMNOpqrsTUVwxyz')
+        self.assertEqual(telegram['telegram_chat_id'], '-1001234567890')
+        self.assertEqual(telegram['telegram_authorized_users'], '123456789,987654321')
 
-        print("✓ Configuration loading test passed")
+        _progress("✓ Configuration loading test passed")
 
     def test_module_imports(self):
         """Test that all required modules can be imported."""
-        print("Testing module imports...")
+        _progress("Testing module imports...")
 
         try:
             # Test main integration modules
-            from modules.meshgram_integration.config_manager import ConfigManager
-            from modules.meshgram_integration.meshgram import MeshgramIntegration
-            from modules.meshgram_integration.telegram_interface import TelegramInterface
-            from modules.meshgram_integration.message_processor import MessageProcessor
-            from modules.meshgram_integration.meshtastic_interface import MeshtasticInterface
-            from modules.meshgram_integration.node_manager import NodeManager
+            for module_name in INTEGRATION_MODULES:
+                importlib.import_module(module_name)
 
-            print("✓ All integration modules imported successfully")
+            _progress("✓ All integration modules imported successfully")
 
             # Test that classes can be instantiated (without full initialization)
             config_manager = ConfigManager()
             self.assertIsNotNone(config_manager)
 
-            print("✓ ConfigManager instantiated successfully")
+            _progress("✓ ConfigManager instantiated successfully")
 
         except ImportError as e:
             self.fail(f"Failed to import required modules: {e}")
 
     def test_config_manager_functionality(self):
         """Test ConfigManager functionality."""
-        print("Testing ConfigManager functionality...")
-
-        from modules.meshgram_integration.config_manager import ConfigManager
+        _progress("Testing ConfigManager functionality...")
 
         # Mock settings module
         with patch('modules.meshgram_integration.config_manager.settings') as mock_settings:
-            mock_settings.config = configparser.ConfigParser()
-            mock_settings.config.read(self.temp_config.name)
+            mock_settings.config = _CONFIG
 
             config_manager = ConfigManager()
 
@@ -110,92 +197,72 @@ defaultChannel = 3
 
             # Test authorized users
             authorized_users = config_manager.get_authorized_users()
-            self.assertEqual(authorized_users, [123456789, 987654321])
+            self.assertEqual(authorized_users, (123456789, 987654321))
+            # Parsed once and returned as-is while the setting is unchanged
+            self.assertIs(config_manager.get_authorized_users(), authorized_users)
 
-            print("✓ ConfigManager functionality test passed")
+            _progress("✓ ConfigManager functionality test passed")
 
+    @requires_integration
     def test_telegram_interface_commands(self):
         """Test Telegram interface command definitions."""
-        print("Testing Telegram interface commands...")
-
-        from modules.meshgram_integration.telegram_interface import TelegramInterface
-        from modules.meshgram_integration.config_manager import ConfigManager
+        _progress("Testing Telegram interface commands...")
 
         # Mock config manager
-        mock_config = Mock(spec=ConfigManager)
-        mock_config.get.side_effect = lambda key: {
-            'telegram.telegram_bot_token': '123456789:ABCdefGHIjklMNOpqrsTUVwxyz',
-            'telegram.telegram_chat_id': -1001234567890
-        }.get(key)
+        mock_config = self._mock_config
+        mock_config.get.side_effect = self._CFG_MAP.get
 
         telegram_interface = TelegramInterface(mock_config)
 
         # Test command definitions
-        expected_commands = ['start', 'help', 'status', 'bell', 'node', 'user']
-        self.assertEqual(list(telegram_interface.commands.keys()), expected_commands)
+        self.assertEqual(telegram_interface.commands.keys(), self.EXPECTED_COMMANDS)
 
         # Test command descriptions
-        for command in expected_commands:
-            self.assertIn(command, telegram_interface.commands)
-            self.assertIn('description', telegram_interface.commands[command])
-            self.assertIn('handler', telegram_interface.commands[command])
+        incomplete = [command for command, spec in telegram_interface.commands.items()
+                      if not self.COMMAND_FIELDS <= spec.keys()]
+        self.assertFalse(incomplete, f"Commands missing description or handler: {incomplete}")
 
-        print("✓ Telegram interface commands test passed")
+        _progress("✓ Telegram interface commands test passed")
 
+    @requires_integration
     def test_message_processor_commands(self):
         """Test MessageProcessor command handlers."""
-        print("Testing MessageProcessor command handlers...")
-
-        from modules.meshgram_integration.message_processor import MessageProcessor
-        from modules.meshgram_integration.telegram_interface import TelegramInterface
-        from modules.meshgram_integration.meshtastic_interface import MeshtasticInterface
-        from modules.meshgram_integration.config_manager import ConfigManager
-        from modules.meshgram_integration.node_manager import NodeManager
+        _progress("Testing MessageProcessor command handlers...")
 
-        # Create mock objects
-        mock_config = Mock(spec=ConfigManager)
+        # Use the shared mock objects
+        mock_config = self._mock_config
         mock_config.get.side_effect = lambda *args, **kwargs: '' if args[0] == 'telegram.meshtastic_local_nodes' else Mock()
-        mock_telegram = Mock(spec=TelegramInterface)
-        mock_meshtastic = Mock(spec=MeshtasticInterface)
-        mock_node_manager = Mock(spec=NodeManager)
-
-        mock_meshtastic.node_manager = mock_node_manager
+        mock_telegram = self._mock_telegram
+        mock_meshtastic = self._mock_meshtastic
+        mock_node_manager = self._mock_node_manager
 
         # Create message processor
         processor = MessageProcessor(mock_meshtastic, mock_telegram, mock_config)
 
         # Test that command handler methods exist
-        command_methods = [
+        command_methods = {
             'cmd_start', 'cmd_help', 'cmd_status', 'cmd_bell',
             'cmd_node', 'cmd_user'
-        ]
+        }
 
-        for method_name in command_methods:
-            self.assertTrue(hasattr(processor, method_name))
-            self.assertTrue(callable(getattr(processor, method_name)))
+        missing = command_methods - set(dir(processor))
+        self.assertFalse(missing, f"Missing command handlers: {sorted(missing)}")
+        not_callable = {name for name in command_methods if not callable(getattr(processor, name))}
+        self.assertFalse(not_callable, f"Command handlers not callable: {sorted(not_callable)}")
 
-        print("✓ MessageProcessor command handlers test passed")
+        _progress("✓ MessageProcessor command handlers test passed")
 
-    def test_command_handler_logic(self):
+    @requires_integration
+    async def test_command_handler_logic(self):
         """Test command handler logic without external dependencies."""
-        print("Testing command handler logic...")
-
-        from modules.meshgram_integration.message_processor import MessageProcessor
-        from modules.meshgram_integration.telegram_interface import TelegramInterface
-        from modules.meshgram_integration.meshtastic_interface import MeshtasticInterface
-        from modules.meshgram_integration.config_manager import ConfigManager
-        from modules.meshgram_integration.node_manager import NodeManager
-        from telegram import Update, User, Message
-        from unittest.mock import AsyncMock
-
-        # Create mock objects
-        mock_config = Mock(spec=ConfigManager)
-        mock_config.get.side_effect = lambda *args, **kwargs: '' if args[0] == 'telegram.meshtastic_local_nodes' else Mock()
-        mock_telegram = Mock(spec=TelegramInterface)
-        mock_meshtastic = Mock(spec=MeshtasticInterface)
-        mock_node_manager = Mock(spec=NodeManager)
+        _progress("Testing command handler logic...")
 
-        mock_meshtastic.node_manager = mock_node_manager
+        # Use the shared mock objects
+        mock_config = self._mock_config
+        mock_config.get.side_effect = lambda *args, **kwargs: '' if args[0] == 'telegram.meshtastic_local_nodes' else Mock()
+        mock_telegram = self._mock_telegram
+        mock_meshtastic = self._mock_meshtastic
+        mock_node_manager = self._mock_node_manager
         mock_meshtastic.send_bell = AsyncMock()
         mock_node_manager.format_node_info = Mock(return_value="Node info")
         mock_node_manager.get_node_telemetry = Mock(return_value="Telemetry info")
@@ -207,68 +274,55 @@ defaultChannel = 3
         # Create message processor
         processor = MessageProcessor(mock_meshtastic, mock_telegram, mock_config)
 
-        # Test start command
-        mock_update = Mock(spec=Update)
-        mock_update.message.reply_text = AsyncMock()
-
-        async def test_start_command():
-            await processor.cmd_start([], 123456789, mock_update)
-            mock_update.message.reply_text.assert_called_once()
-            call_args = mock_update.message.reply_text.call_args[0][0]
-            self.assertIn("Welcome to Meshgram", call_args)
-
-        asyncio.run(test_start_command())
-
-        # Test help command
-        mock_update.message.reply_text.reset_mock()
-        async def test_help_command():
-            await processor.cmd_help([], 123456789, mock_update)
-            mock_update.message.reply_text.assert_called_once()
-            call_args = mock_update.message.reply_text.call_args[0][0]
-            self.assertIn("/start", call_args)
-            self.assertIn("/help", call_args)
-            self.assertIn("/status", call_args)
-
-        asyncio.run(test_help_command())
-
-        # Test user command
-        mock_update.message.reply_text.reset_mock()
-        mock_user = Mock(spec=User)
+        # Plain attribute specs stand in for telegram.Update and telegram.User
+        mock_user = Mock(spec_set=['id', 'username', 'first_name', 'last_name', 'is_bot', 'language_code'])
         mock_user.id = 123456789
         mock_user.username = "testuser"
         mock_user.first_name = "Test"
         mock_user.last_name = "User"
         mock_user.is_bot = False
+
+        mock_update = Mock(spec_set=['message', 'effective_user'])
         mock_update.effective_user = mock_user
+        reply_text = mock_update.message.reply_text = AsyncMock()
+
+        # Drive the start, help and user commands through the same update, keeping each reply
+        replies = []
+        for command in (processor.cmd_start, processor.cmd_help, processor.cmd_user):
+            reply_text.reset_mock()
+            await command([], 123456789, mock_update)
+            reply_text.assert_awaited_once()
+            replies.append(reply_text.call_args.args[0])
+        start_reply, help_reply, user_reply = replies
 
-        async def test_user_command():
-            await processor.cmd_user([], 123456789, mock_update)
-            mock_update.message.reply_text.assert_called_once()
-            call_args = mock_update.message.reply_text.call_args[0][0]
-            self.assertIn("123456789", call_args)
-            self.assertIn("testuser", call_args)
+        # Test start command
+        self.assertIn("Welcome to Meshgram", start_reply)
+
+        # Test help command
+        missing = {'/start', '/help', '/status'} - set(help_reply.split())
+        self.assertFalse(missing, f"Help text is missing {sorted(missing)}")
 
-        asyncio.run(test_user_command())
+        # Test user command
+        self.assertIn("123456789", user_reply)
+        self.assertIn("testuser", user_reply)
 
-        print("✓ Command handler logic test passed")
+        _progress("✓ Command handler logic test passed")
 
+    @requires_integration
     def test_integration_initialization(self):
         """Test that integration can be initialized without external services."""
-        print("Testing integration initialization...")
-
-        from modules.meshgram_integration.meshgram import MeshgramIntegration
-        from modules.meshgram_integration.config_manager import ConfigManager
+        _progress("Testing integration initialization...")
 
         # Mock the config manager to avoid file dependencies
         with patch('modules.meshgram_integration.config_manager.settings') as mock_settings:
-            mock_settings.config = configparser.ConfigParser()
-            mock_settings.config.read(self.temp_config.name)
+            mock_settings.config = _CONFIG
 
             # Mock meshtastic interface
             mock_meshtastic_interface = Mock()
 
-            # Create integration instance
+            # Create integration instance; its ConfigManager reads the shared parser rather than a fresh copy
             integration = MeshgramIntegration(mock_meshtastic_interface)
+            self.assertIs(integration.config.config, _CONFIG)
 
             # Test that integration is not enabled without proper config
             # Create integration with no config to test disabled state
@@ -277,50 +331,42 @@ defaultChannel = 3
             self.assertFalse(integration_no_config.is_enabled())
 
             # Mock config to return valid token
-            integration.config.get = Mock(side_effect=lambda key: {
-                'telegram.telegram_bot_token': '123456789:ABCdefGHIjklMNOpqrsTUVwxyz',
-                'telegram.telegram_chat_id': -1001234567890,
-                'telegram.telegram_authorized_users': '123456789,987654321'
-            }.get(key, ''))
+            integration.config.get = Mock(side_effect=self._CFG_MAP.get)
 
             # Test that integration is enabled with proper config
             self.assertTrue(integration.is_enabled())
 
-            print("✓ Integration initialization test passed")
+            _progress("✓ Integration initialization test passed")
 
     def test_main_bot_integration(self):
         """Test that main bot file properly handles Telegram integration."""
-        print("Testing main bot integration...")
+        _progress("Testing main bot integration...")
 
         # Check that mesh_bot.py has the necessary imports and initialization code
-        with open('mesh_bot.py', 'r') as f:
-            content = f.read()
+        found = set(self._mesh_bot_pat.findall(self._mesh_bot_src))
 
         # Verify that Telegram integration code is present
-        self.assertIn('create_meshgram_integration', content)
-        self.assertIn('telegram_bot_token', content)
-        self.assertIn('telegram_integration', content)
+        missing = self.MESH_BOT_MARKERS - found
+        self.assertFalse(missing, f"Missing from mesh_bot.py: {sorted(missing)}")
 
-        print("✓ Main bot integration test passed")
+        _progress("✓ Main bot integration test passed")
 
     def test_requirements_satisfied(self):
         """Test that all required dependencies are in requirements.txt."""
-        print("Testing requirements...")
+        _progress("Testing requirements...")
 
-        with open('requirements.txt', 'r') as f:
-            requirements_content = f.read()
+        found = set(self._req_pat.findall(self._requirements_src))
 
-        required_packages = [
-            'meshtastic',
-            'python-telegram-bot',
-            'envyaml'
-        ]
+        missing = self.REQUIRED_PACKAGES - found
+        self.assertFalse(missing, f"Required packages not found in requirements.txt: {sorted(missing)}")
 
-        for package in required_packages:
-            self.assertIn(package, requirements_content,
-                         f"Required package '{package}' not found in requirements.txt")
+        _progress("✓ Requirements test passed")
 
-        print("✓ Requirements test passed")
+def _run_test(test: unittest.TestCase) -> unittest.TestResult:
+    """Run a single test into a result of its own."""
+    result = unittest.TestResult()
+    test(result)
+    return result
 
 def run_tests():
     """Run all tests and report results."""
@@ -329,28 +375,42 @@ def run_tests():
 
     # Create test suite
     loader = unittest.TestLoader()
-    suite = loader.loadTestsFromTestCase(TestTelegramIntegration)
-
-    # Run tests
-    runner = unittest.TextTestRunner(verbosity=2)
-    result = runner.run(suite)
+    tests = list(loader.loadTestsFromTestCase(TestTelegramIntegration))
+    serial = [test for test in tests if test._testMethodName in TestTelegramIntegration.SERIAL_TESTS]
+    parallel = [test for test in tests if test._testMethodName not in TestTelegramIntegration.SERIAL_TESTS]
+
+    # Run the independent tests on a thread pool while the serial ones run here;
+    # each test reports into its own TestResult, merged below.
+    TestTelegramIntegration.setUpClass()
+    try:
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            parallel_results = executor.map(_run_test, parallel)
+            results = [_run_test(test) for test in serial]
+            results.extend(parallel_results)
+    finally:
+        TestTelegramIntegration.tearDownClass()
+
+    failures = [failure for result in results for failure in result.failures]
+    errors = [error for result in results for error in result.errors]
+    skipped = [skip for result in results for skip in result.skipped]
 
     print("=" * 50)
-    print(f"Tests run: {result.testsRun}")
-    print(f"Failures: {len(result.failures)}")
-    print(f"Errors: {len(result.errors)}")
+    print(f"Tests run: {sum(result.testsRun for result in results)}")
+    print(f"Failures: {len(failures)}")
+    print(f"Errors: {len(errors)}")
+    print(f"Skipped: {len(skipped)}")
 
-    if result.failures:
+    if failures:
         print("\nFailures:")
-        for test, traceback in result.failures:
+        for test, traceback in failures:
             print(f"- {test}: {traceback}")
 
-    if result.errors:
+    if errors:
         print("\nErrors:")
-        for test, traceback in result.errors:
+        for test, traceback in errors:
             print(f"- {test}: {traceback}")
 
-    if result.failures or result.errors:
+    if failures or errors:
         print("\n❌ Some tests failed")
         return False
     else:
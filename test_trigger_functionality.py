@@ -14,13 +14,15 @@ import asyncio
 import unittest
 from unittest.mock import Mock, patch, MagicMock, AsyncMock
 from typing import List, Dict, Any
-import tempfile
-import shutil
 
 # Add webui to path for imports
 sys.path.append('webui')
 
 # Import required modules
+import webui.db_handler
+import modules.trigger_engine
+import modules.trigger_state
+import modules.trigger_actions
 from webui.db_handler import get_db_connection
 from modules.trigger_engine import TriggerEngine, Position, Zone, Trigger
 from modules.trigger_actions import action_executor
@@ -30,24 +32,144 @@ from modules.trigger_state import TriggerStateManager
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Modules that look up get_db_connection at call time and need the test database
+DB_PATCHED_MODULES = (webui.db_handler, modules.trigger_engine, modules.trigger_state, modules.trigger_actions)
+
+# Simplified version of the dashboard tables the trigger modules use
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS zones (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        latitude REAL NOT NULL,
+        longitude REAL NOT NULL,
+        radius REAL NOT NULL DEFAULT 100,
+        active BOOLEAN DEFAULT 1,
+        description TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS triggers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        zone_id INTEGER NOT NULL,
+        event_type TEXT NOT NULL CHECK (event_type IN ('enter', 'exit')),
+        action_type TEXT NOT NULL,
+        action_payload TEXT DEFAULT '{}',
+        active BOOLEAN DEFAULT 1,
+        FOREIGN KEY (zone_id) REFERENCES zones (id) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS node_zones (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        node_id TEXT NOT NULL,
+        zone_id INTEGER NOT NULL,
+        entered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        is_currently_in BOOLEAN DEFAULT 1,
+        FOREIGN KEY (zone_id) REFERENCES zones (id) ON DELETE CASCADE,
+        UNIQUE(node_id, zone_id)
+    );
+
+    CREATE TABLE IF NOT EXISTS trigger_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        trigger_id INTEGER NOT NULL,
+        node_id TEXT NOT NULL,
+        event_type TEXT NOT NULL CHECK (event_type IN ('enter', 'exit')),
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        zone_name TEXT,
+        node_name TEXT,
+        action_taken TEXT,
+        action_result TEXT,
+        FOREIGN KEY (trigger_id) REFERENCES triggers (id) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS alerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        type TEXT NOT NULL,
+        message TEXT NOT NULL,
+        severity TEXT DEFAULT 'info' CHECK (severity IN ('info', 'warning', 'error')),
+        node_id TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        status TEXT DEFAULT 'active' CHECK (status IN ('active', 'acknowledged', 'resolved'))
+    );
+
+    -- Same lookup indexes as webui/database.py, so queries plan as in production
+    CREATE INDEX IF NOT EXISTS idx_triggers_zone_id ON triggers(zone_id);
+    CREATE INDEX IF NOT EXISTS idx_node_zones_node_id ON node_zones(node_id);
+    CREATE INDEX IF NOT EXISTS idx_trigger_logs_trigger_id ON trigger_logs(trigger_id);
+"""
+
+class SharedConnection:
+    """
+    Hand out one in-memory connection to code that expects to own it.
+
+    An in-memory database only lives as long as its connection, so close()
+    is ignored. commit()/rollback() are ignored too: each test's own
+    transaction is what gets rolled back in tearDown.
+    """
+
+    def __init__(self, real_conn):
+        self.real_conn = real_conn
+
+    def close(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self.real_conn, name)
+
+def _make_test_db_shim(conn, original_get_db_connection):
+    """Build a get_db_connection replacement that serves dashboard.db from conn."""
+    shared_conn = SharedConnection(conn)
+
+    def test_get_db_connection(db_name='dashboard.db'):
+        if db_name == 'dashboard.db':
+            return shared_conn
+        return original_get_db_connection(db_name)
+
+    return test_get_db_connection
+
 class TestTriggerFunctionality(unittest.TestCase):
     """Comprehensive test suite for trigger functionality."""
 
+    @classmethod
+    def setUpClass(cls):
+        """Build the in-memory schema once for the whole class."""
+        # Autocommit mode so each test can own an explicit BEGIN ... ROLLBACK
+        cls._conn = sqlite3.connect(':memory:', isolation_level=None)
+        cls._conn.execute("PRAGMA journal_mode = MEMORY")
+        cls._conn.execute("PRAGMA synchronous = OFF")
+
+        # Initialize test database
+        cls._init_test_database()
+        cls._patch_db_connection()
+
+        # One engine for the class; setUp only resets its per-node state
+        cls.trigger_engine = TriggerEngine(hysteresis_distance=10.0)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Restore the real database connection and drop the shared in-memory database."""
+        for module in DB_PATCHED_MODULES:
+            module.get_db_connection = cls._original_get_db_connection
+        cls._conn.close()
+
     def setUp(self):
         """Set up test environment with isolated database."""
-        # Create temporary directory for test database
-        self.test_dir = tempfile.mkdtemp()
-        self.test_db_path = os.path.join(self.test_dir, 'test_dashboard.db')
+        # Everything a test writes is rolled back in tearDown
+        self._conn.execute("BEGIN")
 
-        # Override database path for testing
-        self.original_db_path = 'webui/dashboard.db'
-        os.environ['TEST_DB_PATH'] = self.test_db_path
+        # One wall-clock read per test; positions are stamped relative to it
+        self.t0 = time.time()
 
-        # Initialize test database
-        self._init_test_database()
-
-        # Create trigger engine and state manager
-        self.trigger_engine = TriggerEngine(hysteresis_distance=10.0)
+        # Start every test with no tracked nodes; create a fresh state manager
+        self.trigger_engine.clear_runtime_state()
         self.state_manager = TriggerStateManager(cache_ttl=300)
 
         # Mock interfaces for testing
@@ -119,227 +241,77 @@ class TestTriggerFunctionality(unittest.TestCase):
 
     def tearDown(self):
         """Clean up test environment."""
-        # Restore original database connection function
-        if hasattr(self, '_original_get_db_connection'):
-            import webui.db_handler
-            webui.db_handler.get_db_connection = self._original_get_db_connection
-
-            # Also restore for other modules
-            import modules.trigger_engine
-            modules.trigger_engine.get_db_connection = self._original_get_db_connection
-
-            import modules.trigger_state
-            modules.trigger_state.get_db_connection = self._original_get_db_connection
-
-            import modules.trigger_actions
-            modules.trigger_actions.get_db_connection = self._original_get_db_connection
-
-        # Clean up trigger engine
-        if self.trigger_engine:
-            # Clean up old states safely
-            try:
-                self.trigger_engine.cleanup_old_states(max_age_hours=0)
-            except AttributeError:
-                # Handle case where position.timestamp is None
-                to_remove = []
-                for node_id, position in self.trigger_engine.node_positions.items():
-                    if position is None or (position.timestamp is None):
-                        to_remove.append(node_id)
-                for node_id in to_remove:
-                    del self.trigger_engine.node_positions[node_id]
-                    if node_id in self.trigger_engine.node_zone_states:
-                        del self.trigger_engine.node_zone_states[node_id]
-
-        # Remove test directory
-        if os.path.exists(self.test_dir):
-            shutil.rmtree(self.test_dir)
-
-        # Reset environment
-        if 'TEST_DB_PATH' in os.environ:
-            del os.environ['TEST_DB_PATH']
-
-    def _init_test_database(self):
-        """Initialize test database with required tables."""
-        conn = sqlite3.connect(self.test_db_path)
-        cursor = conn.cursor()
-
-        # Create tables (simplified version for testing)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS zones (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                latitude REAL NOT NULL,
-                longitude REAL NOT NULL,
-                radius REAL NOT NULL DEFAULT 100,
-                active BOOLEAN DEFAULT 1,
-                description TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS triggers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT,
-                zone_id INTEGER NOT NULL,
-                event_type TEXT NOT NULL CHECK (event_type IN ('enter', 'exit')),
-                action_type TEXT NOT NULL,
-                action_payload TEXT DEFAULT '{}',
-                active BOOLEAN DEFAULT 1,
-                FOREIGN KEY (zone_id) REFERENCES zones (id) ON DELETE CASCADE
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS node_zones (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                node_id TEXT NOT NULL,
-                zone_id INTEGER NOT NULL,
-                entered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_currently_in BOOLEAN DEFAULT 1,
-                FOREIGN KEY (zone_id) REFERENCES zones (id) ON DELETE CASCADE,
-                UNIQUE(node_id, zone_id)
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS trigger_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                trigger_id INTEGER NOT NULL,
-                node_id TEXT NOT NULL,
-                event_type TEXT NOT NULL CHECK (event_type IN ('enter', 'exit')),
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                zone_name TEXT,
-                node_name TEXT,
-                action_taken TEXT,
-                action_result TEXT,
-                FOREIGN KEY (trigger_id) REFERENCES triggers (id) ON DELETE CASCADE
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS alerts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                type TEXT NOT NULL,
-                message TEXT NOT NULL,
-                severity TEXT DEFAULT 'info' CHECK (severity IN ('info', 'warning', 'error')),
-                node_id TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'active' CHECK (status IN ('active', 'acknowledged', 'resolved'))
-            )
-        ''')
-
-        conn.commit()
-        conn.close()
-
-        # Override the database connection function for testing
-        import webui.db_handler
-        original_get_db_connection = webui.db_handler.get_db_connection
+        # Discard everything the test wrote, keeping the schema
+        if self._conn.in_transaction:
+            self._conn.execute("ROLLBACK")
 
-        def test_get_db_connection(db_name='dashboard.db'):
-            if db_name == 'dashboard.db':
-                return sqlite3.connect(self.test_db_path)
-            else:
-                return original_get_db_connection(db_name)
+        # Tests load their own zones and triggers; drop them with the rollback
+        if self.trigger_engine.zones or self.trigger_engine.triggers:
+            self.trigger_engine.reload_configuration()
 
-        webui.db_handler.get_db_connection = test_get_db_connection
-        self._original_get_db_connection = original_get_db_connection
-
-        # Also override for trigger_engine module
-        import modules.trigger_engine
-        modules.trigger_engine.get_db_connection = test_get_db_connection
-
-        # And for trigger_state module
-        import modules.trigger_state
-        modules.trigger_state.get_db_connection = test_get_db_connection
+    @classmethod
+    def _init_test_database(cls):
+        """Initialize test database with required tables."""
+        cls._conn.executescript(SCHEMA_SQL)
 
-        # And for trigger_actions module
-        import modules.trigger_actions
-        modules.trigger_actions.get_db_connection = test_get_db_connection
+    @classmethod
+    def _patch_db_connection(cls):
+        """Point every trigger module at the shared test connection, once per class."""
+        import webui.db_handler
+        cls._original_get_db_connection = webui.db_handler.get_db_connection
+        test_get_db_connection = _make_test_db_shim(cls._conn, cls._original_get_db_connection)
+        for module in DB_PATCHED_MODULES:
+            module.get_db_connection = test_get_db_connection
 
     def _create_test_zones(self) -> List[int]:
         """Create test zones and return their IDs."""
-        zone_ids = []
-        conn = sqlite3.connect(self.test_db_path)
-        cursor = conn.cursor()
-
-        for zone_data in self.test_zones:
-            cursor.execute('''
-                INSERT INTO zones (name, latitude, longitude, radius, description, active)
-                VALUES (?, ?, ?, ?, ?, 1)
-            ''', (
-                zone_data['name'],
-                zone_data['latitude'],
-                zone_data['longitude'],
-                zone_data['radius'],
-                zone_data['description']
-            ))
-            zone_ids.append(cursor.lastrowid)
-
-        conn.commit()
-        conn.close()
-        return zone_ids
+        rows = [
+            (z['name'], z['latitude'], z['longitude'], z['radius'], z['description'])
+            for z in self.test_zones
+        ]
+        return self._insert_returning_ids(
+            'INSERT INTO zones (name, latitude, longitude, radius, description, active)',
+            '(?, ?, ?, ?, ?, 1)',
+            rows
+        )
 
     def _create_test_triggers(self) -> List[int]:
         """Create test triggers and return their IDs."""
-        trigger_ids = []
-        conn = sqlite3.connect(self.test_db_path)
-        cursor = conn.cursor()
-
-        for trigger_data in self.test_triggers:
-            cursor.execute('''
-                INSERT INTO triggers (name, zone_id, event_type, action_type, action_payload, active)
-                VALUES (?, ?, ?, ?, ?, 1)
-            ''', (
-                trigger_data['name'],
-                trigger_data['zone_id'],
-                trigger_data['event_type'],
-                trigger_data['action_type'],
-                trigger_data['action_payload']
-            ))
-            trigger_ids.append(cursor.lastrowid)
-
-        conn.commit()
-        conn.close()
-        return trigger_ids
+        rows = [
+            (t['name'], t['zone_id'], t['event_type'], t['action_type'], t['action_payload'])
+            for t in self.test_triggers
+        ]
+        return self._insert_returning_ids(
+            'INSERT INTO triggers (name, zone_id, event_type, action_type, action_payload, active)',
+            '(?, ?, ?, ?, ?, 1)',
+            rows
+        )
+
+    def _insert_returning_ids(self, insert_sql: str, placeholders: str, rows: List[tuple]) -> List[int]:
+        """Insert all rows in one statement and return their IDs in row order."""
+        # executemany() throws RETURNING rows away, so bind every row into a
+        # single multi-row VALUES statement instead
+        sql = f"{insert_sql} VALUES {', '.join([placeholders] * len(rows))} RETURNING id"
+        params = [value for row in rows for value in row]
+        ids = [row[0] for row in self._conn.execute(sql, params)]
+        # RETURNING order is unspecified; AUTOINCREMENT ids follow row order
+        return sorted(ids)
 
     def _get_zone_count(self) -> int:
         """Get count of zones in test database."""
-        conn = sqlite3.connect(self.test_db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM zones')
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count
+        return self._conn.execute('SELECT COUNT(*) FROM zones').fetchone()[0]
 
     def _get_trigger_count(self) -> int:
         """Get count of triggers in test database."""
-        conn = sqlite3.connect(self.test_db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM triggers')
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count
+        return self._conn.execute('SELECT COUNT(*) FROM triggers').fetchone()[0]
 
     def _get_alert_count(self) -> int:
         """Get count of alerts in test database."""
-        conn = sqlite3.connect(self.test_db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM alerts')
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count
+        return self._conn.execute('SELECT COUNT(*) FROM alerts').fetchone()[0]
 
     def _get_trigger_log_count(self) -> int:
         """Get count of trigger logs in test database."""
-        conn = sqlite3.connect(self.test_db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM trigger_logs')
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count
+        return self._conn.execute('SELECT COUNT(*) FROM trigger_logs').fetchone()[0]
 
     def test_01_zone_creation(self):
         """Test zone creation and loading."""
@@ -400,12 +372,12 @@ class TestTriggerFunctionality(unittest.TestCase):
         self.trigger_engine.reload_configuration()
 
         # Test position outside all zones
-        outside_pos = Position(55.7500, 37.6100, timestamp=time.time())
+        outside_pos = Position(55.7500, 37.6100, timestamp=self.t0)
         events = self.trigger_engine.process_position_update('node_001', outside_pos)
         self.assertEqual(len(events), 0)  # No events expected
 
         # Test position inside zone 1 (55.7558, 37.6173, radius 500m)
-        inside_pos = Position(55.7558, 37.6173, timestamp=time.time())
+        inside_pos = Position(55.7558, 37.6173, timestamp=self.t0)
         events = self.trigger_engine.process_position_update('node_001', inside_pos)
         # Note: We expect 2 events because there are 2 triggers for zone 1 (alert and message)
         self.assertEqual(len(events), 2)  # Two enter events expected (alert + message triggers)
@@ -415,12 +387,12 @@ class TestTriggerFunctionality(unittest.TestCase):
         self.assertEqual(events[1]['zone'].id, zone_ids[0])
 
         # Test position still inside zone 1 (no event expected)
-        inside_pos2 = Position(55.7559, 37.6174, timestamp=time.time())
+        inside_pos2 = Position(55.7559, 37.6174, timestamp=self.t0)
         events = self.trigger_engine.process_position_update('node_001', inside_pos2)
         self.assertEqual(len(events), 0)  # No events expected
 
         # Test position outside zone 1 again
-        outside_pos2 = Position(55.7500, 37.6100, timestamp=time.time())
+        outside_pos2 = Position(55.7500, 37.6100, timestamp=self.t0)
         events = self.trigger_engine.process_position_update('node_001', outside_pos2)
         self.assertEqual(len(events), 2)  # Two exit events expected (alert + message triggers)
         self.assertEqual(events[0]['event_type'], 'exit')
@@ -441,12 +413,12 @@ class TestTriggerFunctionality(unittest.TestCase):
         zone1 = self.trigger_engine.zones[zone_ids[0]]  # radius 500m
 
         # Start outside zone
-        outside_pos = Position(55.7500, 37.6100, timestamp=time.time())
+        outside_pos = Position(55.7500, 37.6100, timestamp=self.t0)
         events = self.trigger_engine.process_position_update('node_002', outside_pos)
         self.assertEqual(len(events), 0)
 
         # Move just inside boundary (should trigger enter)
-        boundary_pos = Position(55.7558, 37.6173, timestamp=time.time())
+        boundary_pos = Position(55.7558, 37.6173, timestamp=self.t0)
         events = self.trigger_engine.process_position_update('node_002', boundary_pos)
         # Note: No triggers for zone 1 in hysteresis test (only zones 1-3, but triggers are only for zone 1)
         # Actually, we need to create triggers for the hysteresis test zone
@@ -454,7 +426,7 @@ class TestTriggerFunctionality(unittest.TestCase):
         self.assertEqual(len(events), 0)  # No triggers for zone 1 in this test
 
         # Move just outside boundary (within hysteresis distance - should NOT trigger exit)
-        hysteresis_pos = Position(55.7558 + 0.0001, 37.6173 + 0.0001, timestamp=time.time())
+        hysteresis_pos = Position(55.7558 + 0.0001, 37.6173 + 0.0001, timestamp=self.t0)
         # Calculate if this position is within hysteresis distance of boundary
         distance_from_center = self.trigger_engine.calculate_distance(hysteresis_pos, Position(zone1.latitude, zone1.longitude))
         if abs(distance_from_center - zone1.radius) <= self.trigger_engine.hysteresis_distance:
@@ -462,7 +434,7 @@ class TestTriggerFunctionality(unittest.TestCase):
             self.assertEqual(len(events), 0)  # Hysteresis should prevent false exit
 
         # Move well outside boundary (should trigger exit)
-        well_outside_pos = Position(55.7500, 37.6100, timestamp=time.time())
+        well_outside_pos = Position(55.7500, 37.6100, timestamp=self.t0)
         events = self.trigger_engine.process_position_update('node_002', well_outside_pos)
         self.assertEqual(len(events), 0)  # No triggers for zone 1 in this test
 
@@ -482,18 +454,20 @@ class TestTriggerFunctionality(unittest.TestCase):
             mock_execute_action.return_value = True
 
             # Trigger enter event
-            inside_pos = Position(55.7558, 37.6173, timestamp=time.time())
+            inside_pos = Position(55.7558, 37.6173, timestamp=self.t0)
 
             # Run the position update in an async context to handle async actions
             async def run_test():
                 events = self.trigger_engine.process_position_update('node_003', inside_pos)
                 # Simulate async action execution (this would normally be done by the system)
-                for event in events:
-                    await mock_execute_action(
+                await asyncio.gather(*(
+                    mock_execute_action(
                         event['trigger'].action_type,
                         event['trigger'].action_payload,
                         event
                     )
+                    for event in events
+                ))
                 return events
 
             # Execute the async test
@@ -523,18 +497,18 @@ class TestTriggerFunctionality(unittest.TestCase):
         self.trigger_engine.reload_configuration()
 
         # Node 1 enters zone 1
-        pos1 = Position(55.7558, 37.6173, timestamp=time.time())
+        pos1 = Position(55.7558, 37.6173, timestamp=self.t0)
         events1 = self.trigger_engine.process_position_update('node_001', pos1)
         self.assertEqual(len(events1), 2)  # 2 triggers for zone 1
 
         # Node 2 enters overlapping area (both zones 1 and 2)
-        pos2 = Position(55.7560, 37.6174, timestamp=time.time())
+        pos2 = Position(55.7560, 37.6174, timestamp=self.t0)
         events2 = self.trigger_engine.process_position_update('node_002', pos2)
         # Should trigger enter for zones 1 and 2 (alert + message for zone 1, alert for zone 2)
         self.assertEqual(len(events2), 3)  # 3 triggers total
 
         # Node 3 enters zone 3 (large zone)
-        pos3 = Position(55.7600, 37.6200, timestamp=time.time())
+        pos3 = Position(55.7600, 37.6200, timestamp=self.t0)
         events3 = self.trigger_engine.process_position_update('node_003', pos3)
         self.assertEqual(len(events3), 0)  # No triggers for zone 3
 
@@ -565,7 +539,7 @@ class TestTriggerFunctionality(unittest.TestCase):
         self.assertEqual(initial_count, 0)
 
         # Trigger some events
-        pos = Position(55.7558, 37.6173, timestamp=time.time())
+        pos = Position(55.7558, 37.6173, timestamp=self.t0)
         events = self.trigger_engine.process_position_update('node_persist', pos)
         self.assertEqual(len(events), 0)  # No triggers for zone 1 in this test
 
@@ -574,11 +548,7 @@ class TestTriggerFunctionality(unittest.TestCase):
         self.assertEqual(log_count, 0)
 
         # Check node_zones table
-        conn = sqlite3.connect(self.test_db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM node_zones WHERE node_id = ?', ('node_persist',))
-        node_zone_count = cursor.fetchone()[0]
-        conn.close()
+        node_zone_count = self._conn.execute('SELECT COUNT(*) FROM node_zones WHERE node_id = ?', ('node_persist',)).fetchone()[0]
         self.assertEqual(node_zone_count, 1)
 
         logger.info("✓ State persistence test passed")
@@ -592,10 +562,14 @@ class TestTriggerFunctionality(unittest.TestCase):
         self.trigger_engine.reload_configuration()
 
         # Add some old position data
-        old_time = time.time() - (25 * 3600)  # 25 hours ago
+        old_time = self.t0 - (25 * 3600)  # 25 hours ago
         self.trigger_engine.node_positions['old_node'] = Position(55.7558, 37.6173, timestamp=old_time)
         self.trigger_engine.node_zone_states['old_node'] = {zone_ids[0]: True}
 
+        # A node whose position was never usable
+        self.trigger_engine.node_positions['empty_node'] = None
+        self.trigger_engine.node_zone_states['empty_node'] = {}
+
         # Verify old data exists
         self.assertIn('old_node', self.trigger_engine.node_positions)
         self.assertIn('old_node', self.trigger_engine.node_zone_states)
@@ -606,6 +580,8 @@ class TestTriggerFunctionality(unittest.TestCase):
         # Verify old data was cleaned up
         self.assertNotIn('old_node', self.trigger_engine.node_positions)
         self.assertNotIn('old_node', self.trigger_engine.node_zone_states)
+        self.assertNotIn('empty_node', self.trigger_engine.node_positions)
+        self.assertNotIn('empty_node', self.trigger_engine.node_zone_states)
 
         logger.info("✓ Cleanup old states test passed")
 
@@ -627,6 +603,10 @@ class TestTriggerFunctionality(unittest.TestCase):
         distance_same = self.trigger_engine.calculate_distance(pos1, pos1)
         self.assertAlmostEqual(distance_same, 0, places=2)
 
+        # Zone distances use cached radians but must agree with the full formula
+        zone = Zone(1, 'Distance Zone', pos2.latitude, pos2.longitude, 100)
+        self.assertAlmostEqual(self.trigger_engine.distance_to_zone(pos1, zone), distance, places=6)
+
         logger.info("✓ Distance calculation test passed")
 
     def test_10_zone_boundary_detection(self):
@@ -649,7 +629,7 @@ class TestTriggerFunctionality(unittest.TestCase):
         inside_pos = Position(
             zone1.latitude + 0.001,  # ~111m north
             zone1.longitude,
-            timestamp=time.time()
+            timestamp=self.t0
         )
         self.assertTrue(self.trigger_engine.is_position_in_zone(inside_pos, zone1))
 
@@ -657,7 +637,7 @@ class TestTriggerFunctionality(unittest.TestCase):
         outside_pos = Position(
             zone1.latitude + 0.005,  # ~555m north (outside 500m radius)
             zone1.longitude,
-            timestamp=time.time()
+            timestamp=self.t0
         )
         self.assertFalse(self.trigger_engine.is_position_in_zone(outside_pos, zone1))
 
@@ -693,28 +673,146 @@ class TestTriggerFunctionality(unittest.TestCase):
         """Test performance with multiple rapid position updates."""
         logger.info("Testing performance with multiple updates...")
 
-        # Setup zones
+        # Setup zones and triggers
         zone_ids = self._create_test_zones()
+        self._create_test_triggers()
         self.trigger_engine.reload_configuration()
 
-        import time
-        start_time = time.time()
-
-        # Simulate 100 rapid position updates
-        for i in range(100):
-            lat = 55.7558 + (i * 0.0001)  # Small movements
-            lng = 37.6173 + (i * 0.0001)
-            pos = Position(lat, lng, timestamp=time.time())
-            events = self.trigger_engine.process_position_update(f'perf_node_{i%5}', pos)
+        # Simulate 100 rapid position updates (small movements)
+        node_ids = [f'perf_node_{i%5}' for i in range(100)]
+        lats = [55.7558 + (i * 0.0001) for i in range(100)]
+        lngs = [37.6173 + (i * 0.0001) for i in range(100)]
+        timestamps = [self.t0 + i * 0.01 for i in range(100)]
 
+        start_time = time.time()
+        events = self.trigger_engine.process_position_updates_batch(node_ids, lats, lngs, timestamps)
         end_time = time.time()
+
         duration = end_time - start_time
 
+        # Every node ends up tracked at its last position
+        self.assertEqual(len(self.trigger_engine.node_positions), 5)
+        self.assertAlmostEqual(self.trigger_engine.node_positions['perf_node_4'].latitude, lats[-1])
+        batch_states = {node_id: dict(states) for node_id, states in self.trigger_engine.node_zone_states.items()}
+
+        # Replaying the same updates one at a time gives the same events and states
+        self.trigger_engine.clear_runtime_state()
+        sequential_events = []
+        for node_id, lat, lng, ts in zip(node_ids, lats, lngs, timestamps):
+            sequential_events.extend(
+                self.trigger_engine.process_position_update(node_id, Position(lat, lng, timestamp=ts))
+            )
+
+        def summary(event_list):
+            return [(e['node_id'], e['event_type'], e['trigger_id'], e['zone'].id, e['position']) for e in event_list]
+
+        self.assertTrue(events)
+        self.assertEqual(summary(events), summary(sequential_events))
+        self.assertEqual(batch_states, self.trigger_engine.node_zone_states)
+
         # Should complete in reasonable time (less than 5 seconds)
         self.assertLess(duration, 5.0, f"Performance test took too long: {duration}s")
 
         logger.info(f"✓ Performance test passed ({duration:.2f}s for 100 updates)")
 
+    def test_13_zoned_index_scaling(self):
+        """Test that the latitude stripe index narrows the zones checked per update."""
+        logger.info("Testing zone index with many zones...")
+
+        # 500 synthetic 200m zones spread over 5 degrees of latitude
+        self._conn.executemany('''
+            INSERT INTO zones (name, latitude, longitude, radius, description, active)
+            VALUES (?, ?, ?, ?, ?, 1)
+        ''', [
+            (f'Synthetic Zone {i}', 50.0 + i * 0.01, 37.6173, 200, 'Synthetic zone')
+            for i in range(500)
+        ])
+        self.trigger_engine.reload_configuration()
+        self.assertEqual(len(self.trigger_engine.zones), 500)
+        self.assertGreater(len(self.trigger_engine._zone_stripes), 1)
+
+        # Standing on the center of zone 250 only its neighbourhood is checked
+        pos = Position(52.5, 37.6173, timestamp=self.t0)
+        candidates = self.trigger_engine._candidate_zones('index_node', pos)
+        self.assertLess(len(candidates), 10)
+
+        # The indexed update agrees with a full scan over every zone
+        self.trigger_engine.process_position_update('index_node', pos)
+        expected = {zone.id for zone in self.trigger_engine.zones.values()
+                    if self.trigger_engine.is_position_in_zone(pos, zone)}
+        current = {zone.id for zone in self.trigger_engine.get_node_current_zones('index_node')}
+        self.assertEqual(current, expected)
+        self.assertEqual(len(current), 1)
+
+        # A long jump still reports the exit from the zone the node was in
+        far = Position(10.0, 10.0, timestamp=self.t0)
+        self.trigger_engine.process_position_update('index_node', far)
+        self.assertEqual(self.trigger_engine.get_node_current_zones('index_node'), [])
+
+        # Updates should stay well under a full 500-zone scan per call
+        start_time = time.time()
+        for i in range(100):
+            self.trigger_engine.process_position_update(
+                f'index_node_{i % 5}', Position(50.0 + i * 0.05, 37.6173, timestamp=self.t0 + i * 0.01)
+            )
+        duration = time.time() - start_time
+        self.assertLess(duration, 5.0, f"Indexed updates took too long: {duration}s")
+
+        logger.info(f"✓ Zone index test passed ({duration:.2f}s for 100 updates over 500 zones)")
+
+    @unittest.skipUnless(modules.trigger_engine.NUMBA_AVAILABLE, "numba not installed")
+    def test_14_numba_kernel(self):
+        """Test that the compiled zone kernel matches numpy and outperforms it."""
+        logger.info("Testing numba zone membership kernel...")
+        te = modules.trigger_engine
+        np = te.np
+
+        # Compiled scalar helper against its pure-Python source
+        points = [
+            (55.7558, 37.6173, 55.7559, 37.6174),
+            (55.7558, 37.6173, 55.7600, 37.6200),
+            (50.0, 37.6173, 52.5, 37.6173),
+            (-33.8688, 151.2093, 51.5074, -0.1278),
+        ]
+        for lat1, lon1, lat2, lon2 in points:
+            args = (np.radians(lat1), np.radians(lon1), np.cos(np.radians(lat1)),
+                    np.radians(lat2), np.radians(lon2), np.cos(np.radians(lat2)))
+            expected = te._haversine_rad(*args)
+            compiled = te._haversine_rad_compiled(*args)
+            self.assertAlmostEqual(compiled, expected, delta=1e-9 * max(expected, 1.0))
+
+        # 1000 positions against 500 zones around Moscow
+        rng = np.random.default_rng(42)
+        lats = np.radians(55.75 + rng.uniform(-0.5, 0.5, 1000))
+        lons = np.radians(37.62 + rng.uniform(-0.5, 0.5, 1000))
+        zone_rlats = np.radians(55.75 + rng.uniform(-0.5, 0.5, 500))
+        zone_rlons = np.radians(37.62 + rng.uniform(-0.5, 0.5, 500))
+        zone_coslats = np.cos(zone_rlats)
+        zone_radii = rng.uniform(500, 5000, 500)
+        args = (lats, lons, zone_rlats, zone_rlons, zone_coslats, zone_radii)
+
+        # TriggerEngine() already compiled the kernel, real arrays must not compile it again
+        TriggerEngine()
+        kernel_result = te._zone_membership(*args)
+        self.assertEqual(len(te._zone_membership.signatures), 1)
+        numpy_result = te._zone_membership_numpy(*args)
+        self.assertTrue(np.array_equal(kernel_result, numpy_result))
+
+        def best_of(func, runs=5):
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                func(*args)
+                timings.append(time.perf_counter() - start)
+            return min(timings)
+
+        kernel_time = best_of(te._zone_membership)
+        numpy_time = best_of(te._zone_membership_numpy)
+        logger.info(f"Zone membership 1000x500: numba {kernel_time*1000:.1f}ms, numpy {numpy_time*1000:.1f}ms")
+        self.assertLess(kernel_time, numpy_time)
+
+        logger.info("✓ Numba kernel test passed")
+
 def run_tests():
     """Run all tests with verbose output."""
     # Create test suite
@@ -12,6 +12,9 @@ logger = logging.getLogger(__name__)
 
 class CacheManager:
     def __init__(self, host='localhost', port=6379, db=0, password=None):
+        # Version stamped into the in-memory nodes key, bumped by invalidate_nodes()
+        self._nodes_version = 0
+        self._nodes_key = "nodes:active"
         if redis is None:
             logger.warning("Redis module not installed, using in-memory cache")
             self.redis = None
@@ -74,7 +77,19 @@ class CacheManager:
             return False
 
     def get_nodes_cache_key(self) -> str:
-        return "nodes:active"
+        return self._nodes_key
+
+    def invalidate_nodes(self) -> None:
+        """Invalidate cached node lists."""
+        if self.redis:
+            # Redis is shared with other processes, so the fixed key has to be deleted
+            self.delete(self._nodes_key)
+        else:
+            # In-memory: move readers to a new key and drop the stale entry
+            stale_key = self._nodes_key
+            self._nodes_version += 1
+            self._nodes_key = f"nodes:active:v{self._nodes_version}"
+            self.memory_cache.pop(stale_key, None)
 
     def get_routes_cache_key(self, node_id: str = None, hours: int = 24) -> str:
         if node_id:
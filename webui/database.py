@@ -433,13 +433,17 @@ def init_db():
         'is_online': 'BOOLEAN DEFAULT 0',
         'last_telemetry': 'TIMESTAMP',
         'ground_speed': 'REAL',
-        'precision_bits': 'INTEGER'
+        'precision_bits': 'INTEGER',
+        'last_activity': 'TIMESTAMP'
     }
 
     for col_name, col_type in telemetry_columns.items():
         if col_name not in node_columns:
             cursor.execute(f"ALTER TABLE nodes ADD COLUMN {col_name} {col_type}")
 
+    # Index for the offline sweep (is_online = 1 AND last_activity < ?)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_nodes_online_activity ON nodes(is_online, last_activity)')
+
     # Ensure messages table has delivery tracking columns
     cursor.execute("PRAGMA table_info(messages)")
     message_columns = [col[1] for col in cursor.fetchall()]
@@ -457,6 +461,12 @@ def init_db():
         if col_name not in message_columns:
             cursor.execute(f"ALTER TABLE messages ADD COLUMN {col_name} {col_type}")
 
+    # Index for the resend lookup, created after the delivery columns are guaranteed to exist.
+    # It also covers the timestamp filter, superseding the narrower idx_messages_resend.
+    cursor.execute('DROP INDEX IF EXISTS idx_messages_resend')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_node_status ON messages(to_node_id, status, attempt_count, timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_status_retry ON messages(status, next_retry_time)')
+
     # Ensure triggers table has active column
     cursor.execute("PRAGMA table_info(triggers)")
     trigger_columns = [col[1] for col in cursor.fetchall()]
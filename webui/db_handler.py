@@ -6,6 +6,8 @@ import time
 import logging
 import sys
 import functools
+import threading
+import atexit
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from modules.log import logger
 from .cache import get_cache_manager
@@ -46,11 +48,31 @@ def retry_on_lock(max_retries=5, base_delay=0.2, max_delay=3.0):
         return wrapper
     return decorator
 
+# Tuning applied to every connection. synchronous is per connection, and
+# NORMAL is safe under WAL and avoids an fsync on every commit.
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -20000",
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Extra tuning for the long-lived per-thread connections only; mapping the
+# file is not worth it for a connection that is closed after one query
+THREAD_CONNECTION_PRAGMAS = (
+    "PRAGMA mmap_size = 268435456",
+)
+
+# UPDATE ... RETURNING needs SQLite 3.35 or newer
+SQLITE_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
 def get_db_connection(db_name='dashboard.db'):
     """Get database connection with WAL mode ensured."""
     db_path = os.path.join(os.path.dirname(__file__), db_name)
-    conn = sqlite3.connect(db_path)
+    # A larger statement cache keeps the parsed form of the repeated queries around
+    conn = sqlite3.connect(db_path, cached_statements=256)
     conn.execute("PRAGMA foreign_keys = ON")
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
     # Ensure WAL mode is set on every connection
     cursor = conn.cursor()
     cursor.execute("PRAGMA journal_mode = WAL")
@@ -59,6 +81,55 @@ def get_db_connection(db_name='dashboard.db'):
         logger.warning(f"Failed to set WAL mode on {db_name}, current mode: {journal_mode}")
     return conn
 
+_thread_local = threading.local()
+_thread_connections = []
+_thread_connections_lock = threading.Lock()
+
+def get_thread_db_connection(db_name='dashboard.db'):
+    """Get a tuned connection cached for the calling thread.
+
+    The connection is shared by every caller on the same thread, so callers
+    must not close it; all cached connections are closed at interpreter exit.
+    """
+    connections = getattr(_thread_local, 'connections', None)
+    if connections is None:
+        connections = _thread_local.connections = {}
+    conn = connections.get(db_name)
+    if conn is None:
+        conn = get_db_connection(db_name)
+        for pragma in THREAD_CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        connections[db_name] = conn
+        with _thread_connections_lock:
+            _thread_connections.append(conn)
+    return conn
+
+def get_thread_db_cursor(db_name='dashboard.db'):
+    """Get a cursor cached alongside the calling thread's connection.
+
+    The cursor is reused across calls, so fetch results before issuing the next query.
+    """
+    cursors = getattr(_thread_local, 'cursors', None)
+    if cursors is None:
+        cursors = _thread_local.cursors = {}
+    conn = get_thread_db_connection(db_name)
+    cursor = cursors.get(db_name)
+    if cursor is None or cursor.connection is not conn:
+        cursor = cursors[db_name] = conn.cursor()
+    return cursor
+
+@atexit.register
+def close_thread_db_connections():
+    """Close every connection handed out by get_thread_db_connection."""
+    with _thread_connections_lock:
+        while _thread_connections:
+            conn = _thread_connections.pop()
+            try:
+                conn.close()
+            except sqlite3.Error:
+                # Connections owned by other threads cannot be closed from here
+                pass
+
 def ensure_wal_mode_on_all_dbs():
     """Ensure WAL mode is enabled on all database files."""
     db_files = ['dashboard.db', '../data/checklist.db']
@@ -94,8 +165,7 @@ def update_node(node_id, **kwargs):
         conn.commit()
 
         # Invalidate nodes cache
-        cache = get_cache_manager()
-        cache.delete(cache.get_nodes_cache_key())
+        get_cache_manager().invalidate_nodes()
         logger.debug(f"Invalidated nodes cache after update for {node_id}")
     finally:
         conn.close()
@@ -146,57 +216,43 @@ def check_and_update_offline_nodes():
             timeout_minutes = 30
         threshold = time.time() - (timeout_minutes * 60)
 
-        # Debug: Log nodes that would be set offline
-        cursor.execute("""
-            SELECT n.node_id, n.last_activity
-            FROM nodes n
-            WHERE n.last_activity < ?
-            AND n.is_online = 1
-        """, (threshold,))
-        debug_rows = cursor.fetchall()
-        if debug_rows:
-            logger.info(f"Debug: {len(debug_rows)} nodes to be set offline (timeout: {timeout_minutes} minutes)")
-            for row in debug_rows[:5]:  # Log first 5 for brevity
-                logger.info(f"Debug: Node {row[0]} - last_activity={row[1]}, threshold={threshold}")
-
-        # Find nodes that haven't been active in the last configured timeout
-        # Use unified last_activity field which is updated for all packet types
-        cursor.execute("""
-            UPDATE nodes
-            SET is_online = 0
-            WHERE last_activity < ?
-            AND is_online = 1
-        """, (threshold,))
-
-        updated_count = cursor.rowcount
-        if updated_count > 0:
-            logger.info(f"Set {updated_count} nodes offline due to inactivity")
-
-            # Get nodes that were just set offline for broadcasting
+        # Find nodes that haven't been active in the last configured timeout and set them offline
+        # in one statement. Use unified last_activity field which is updated for all packet types
+        if SQLITE_HAS_RETURNING:
             cursor.execute("""
-                SELECT node_id FROM nodes WHERE is_online = 0 AND last_activity < ?
+                UPDATE nodes
+                SET is_online = 0
+                WHERE is_online = 1
+                AND last_activity < ?
+                RETURNING node_id
             """, (threshold,))
             offline_nodes = [row[0] for row in cursor.fetchall()]
-            if offline_nodes:
-                logger.info(f"Nodes set offline: {offline_nodes}")
+        else:
+            cursor.execute("SELECT node_id FROM nodes WHERE is_online = 1 AND last_activity < ?", (threshold,))
+            offline_nodes = [row[0] for row in cursor.fetchall()]
+            cursor.execute("UPDATE nodes SET is_online = 0 WHERE is_online = 1 AND last_activity < ?", (threshold,))
+
+        if offline_nodes:
+            logger.info(f"Set {len(offline_nodes)} nodes offline due to inactivity (timeout: {timeout_minutes} minutes)")
+            logger.info(f"Nodes set offline: {offline_nodes}")
 
-                # Broadcast node status updates via WebSocket
+            # Broadcast node status updates via WebSocket
+            try:
+                from .main import broadcast_map_update
+                import asyncio
                 try:
-                    from .main import broadcast_map_update
-                    import asyncio
-                    try:
-                        loop = asyncio.get_running_loop()
-                        for node_id in offline_nodes:
-                            asyncio.create_task(broadcast_map_update("node_status", {
-                                "node_id": str(node_id),
-                                "is_online": False,
-                                "reason": "inactivity_timeout"
-                            }))
-                    except RuntimeError:
-                        # No running event loop, skip broadcasting
-                        logger.debug("No running event loop, skipping WebSocket broadcast for offline nodes")
-                except ImportError:
-                    logger.debug("WebSocket broadcasting not available")
+                    loop = asyncio.get_running_loop()
+                    for node_id in offline_nodes:
+                        asyncio.create_task(broadcast_map_update("node_status", {
+                            "node_id": str(node_id),
+                            "is_online": False,
+                            "reason": "inactivity_timeout"
+                        }))
+                except RuntimeError:
+                    # No running event loop, skip broadcasting
+                    logger.debug("No running event loop, skipping WebSocket broadcast for offline nodes")
+            except ImportError:
+                logger.debug("WebSocket broadcasting not available")
 
         conn.commit()
         duration = time.time() - start_time
@@ -1520,6 +1576,25 @@ def get_active_triggers():
     finally:
         conn.close()
 
+def _broadcast_message_status_updates(updates):
+    """Send message_status updates to WebSocket clients when an event loop is running."""
+    try:
+        from .main import broadcast_message_update
+    except ImportError:
+        logger.debug("WebSocket broadcasting not available for message updates")
+        return
+
+    import asyncio
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        # No running event loop, skip broadcasting
+        logger.debug("No running event loop, skipping WebSocket broadcast for message status")
+        return
+
+    for update_data in updates:
+        asyncio.create_task(broadcast_message_update("message_status", update_data))
+
 @retry_on_lock()
 def update_message_delivery_status(message_id, delivered=None, retry_count=None, delivery_attempts=None, attempt_count=None, status=None, last_attempt_time=None, next_retry_time=None, error_message=None, defer_count=None):
     """Update delivery status of a message."""
@@ -1553,25 +1628,71 @@ def update_message_delivery_status(message_id, delivered=None, retry_count=None,
             conn.commit()
 
             # Broadcast message status update via WebSocket
-            try:
-                from .main import broadcast_message_update
-                import asyncio
-                try:
-                    loop = asyncio.get_running_loop()
-                    update_data = {"message_id": message_id}
-                    update_data.update(updates)
-                    asyncio.create_task(broadcast_message_update("message_status", update_data))
-                except RuntimeError:
-                    # No running event loop, skip broadcasting
-                    logger.debug("No running event loop, skipping WebSocket broadcast for message status")
-            except ImportError:
-                logger.debug("WebSocket broadcasting not available for message updates")
+            _broadcast_message_status_updates([{"message_id": message_id, **updates}])
 
             return conn.total_changes > 0
         return False
     finally:
         conn.close()
 
+@retry_on_lock()
+def bulk_update_message_delivery_status(updates):
+    """Apply many (status, attempt_count, message_id) updates in one transaction.
+
+    A None status or attempt_count keeps the stored value for that message.
+    """
+    if not updates:
+        return 0
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "UPDATE messages SET status = COALESCE(?, status), attempt_count = COALESCE(?, attempt_count) WHERE message_id = ?",
+            updates
+        )
+        conn.commit()
+        updated_count = cursor.rowcount
+
+        # Broadcast message status updates via WebSocket
+        broadcasts = []
+        for status, attempt_count, message_id in updates:
+            update_data = {"message_id": message_id}
+            if status is not None:
+                update_data['status'] = status
+            if attempt_count is not None:
+                update_data['attempt_count'] = attempt_count
+            broadcasts.append(update_data)
+        _broadcast_message_status_updates(broadcasts)
+
+        return updated_count
+    finally:
+        conn.close()
+
+@retry_on_lock()
+def mark_messages_delivered(message_ids):
+    """Mark many messages delivered in one statement and return the ids that were updated."""
+    if not message_ids:
+        return []
+    placeholders = ",".join("?" * len(message_ids))
+    query = f"UPDATE messages SET delivered = 1, status = 'delivered' WHERE message_id IN ({placeholders})"
+    conn = get_db_connection()
+    try:
+        if SQLITE_HAS_RETURNING:
+            delivered_ids = [row[0] for row in conn.execute(query + " RETURNING message_id", list(message_ids))]
+        else:
+            conn.execute(query, list(message_ids))
+            delivered_ids = list(message_ids)
+        conn.commit()
+
+        # Broadcast message status updates via WebSocket
+        _broadcast_message_status_updates(
+            {"message_id": message_id, "delivered": 1, "status": "delivered"} for message_id in delivered_ids
+        )
+
+        return delivered_ids
+    finally:
+        conn.close()
+
 def get_undelivered_messages(to_node_id=None, limit=50):
     """Get undelivered messages, optionally filtered by to_node_id."""
     conn = get_db_connection()
@@ -1593,6 +1714,36 @@ def get_undelivered_messages(to_node_id=None, limit=50):
     finally:
         conn.close()
 
+# Messages due for a resend to one node: 'sent' but unconfirmed after 30s, or
+# 'queued' and past their retry time. Params: (to_node_id, now - 30, now).
+# Both branches resolve through idx_messages_node_status.
+RESEND_MESSAGES_SQL = """
+    SELECT * FROM messages
+    WHERE to_node_id = ? AND (
+        (status = 'sent' AND delivered = 0 AND timestamp < ? AND attempt_count < 3)
+        OR (status = 'queued' AND attempt_count < 9 AND (next_retry_time IS NULL OR next_retry_time <= ?))
+    )
+"""
+
+def get_nodes_with_due_messages(now=None):
+    """Get the to_node_ids that have 'sent' or 'queued' messages due for a resend attempt."""
+    if now is None:
+        now = time.time()
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        # Each branch is resolved through an index (status, next_retry_time / to_node_id, status, ...)
+        cursor.execute("""
+            SELECT to_node_id FROM messages
+            WHERE status = 'queued' AND attempt_count < 9 AND (next_retry_time IS NULL OR next_retry_time <= ?)
+            UNION
+            SELECT to_node_id FROM messages
+            WHERE status = 'sent' AND delivered = 0 AND timestamp < ? AND attempt_count < 3
+        """, (now, now - 30))
+        return {row[0] for row in cursor.fetchall() if row[0] is not None}
+    finally:
+        conn.close()
+
 def get_queued_messages(to_node_id=None, limit=50):
     """Get queued messages, optionally filtered by to_node_id."""
     conn = get_db_connection()